@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(choices=[('production', 'Production Order'), ('invoice', 'Invoice Item')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('movement_date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('balance_quantity', models.IntegerField()),
+                ('balance_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('method', models.CharField(choices=[('fifo', 'FIFO'), ('average', 'Weighted Average')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='products.footwearproduct')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'movement_date'], name='inv_movement_product_date')],
+                'unique_together': {('source_type', 'source_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('remaining_quantity', models.IntegerField()),
+                ('unit_cost', models.DecimalField(decimal_places=6, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='products.footwearproduct')),
+                ('receipt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layer', to='products.inventorymovement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'remaining_quantity'], name='cost_layer_product_remaining')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0001_initial'),
+        ('products', '0003_inventory_costing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productionorder',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='production_orders', to='accounting.invoice'),
+        ),
+    ]
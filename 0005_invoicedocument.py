@@ -0,0 +1,24 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0001_initial'),
+        ('products', '0004_productionorder_invoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_version', models.PositiveIntegerField(default=1)),
+                ('rendered_version', models.PositiveIntegerField(default=0)),
+                ('html', models.TextField(blank=True)),
+                ('rendered_at', models.DateTimeField(blank=True, null=True)),
+                ('invoice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='document', to='accounting.invoice')),
+            ],
+        ),
+    ]
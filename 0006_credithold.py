@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_invoicedocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('released', 'Released'), ('invoiced', 'Invoiced')], default='active', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_holds', to='products.wholesalecustomer')),
+                ('production_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='credit_holds', to='products.productionorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['customer', 'status'], name='credit_hold_customer_status')],
+            },
+        ),
+    ]
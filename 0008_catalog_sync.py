@@ -0,0 +1,52 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_pricelistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='sizeconversion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='footwearproduct',
+            index=models.Index(fields=['updated_at', 'id'], name='product_changes'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['updated_at', 'id'], name='material_changes'),
+        ),
+        migrations.AddIndex(
+            model_name='sizeconversion',
+            index=models.Index(fields=['updated_at', 'id'], name='size_conversion_changes'),
+        ),
+        migrations.AddIndex(
+            model_name='pricelistentry',
+            index=models.Index(fields=['updated_at', 'id'], name='price_list_changes'),
+        ),
+        migrations.CreateModel(
+            name='CatalogTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('material', 'Material'), ('size', 'Size'), ('price', 'Price')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='catalog_tombstone_changes')],
+            },
+        ),
+    ]
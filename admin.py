@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 from .models import (
     FootwearProduct, FootwearCategory, Material, SizeChart, SizeConversion,
-    BillOfMaterials, WholesaleCustomer, CustomDesign, ProductionOrder
+    BillOfMaterials, WholesaleCustomer, CustomDesign, ProductionOrder,
+    AccountBalance, BalanceCheckpoint
 )
 
 @admin.register(FootwearCategory)
@@ -141,4 +142,17 @@ class ProductionOrderAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not change:  # creating a new object
             obj.created_by = request.user
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+@admin.register(AccountBalance)
+class AccountBalanceAdmin(admin.ModelAdmin):
+    list_display = ['account', 'debit_total', 'credit_total', 'balance', 'updated_at']
+    search_fields = ['account__account_code', 'account__account_name']
+    readonly_fields = ['account', 'debit_total', 'credit_total', 'updated_at']
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['account', 'checkpoint_date', 'debit_total', 'credit_total', 'created_at']
+    list_filter = ['checkpoint_date']
+    search_fields = ['account__account_code', 'account__account_name']
+    readonly_fields = ['account', 'checkpoint_date', 'debit_total', 'credit_total', 'created_at']
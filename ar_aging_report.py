@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from products.aging import AGING_FIELDS, iter_aging_rows
+from products.streaming import STREAM_FORMATS, write_stream
+
+class Command(BaseCommand):
+    help = 'Write the accounts-receivable aging report as CSV or NDJSON'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='Report date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--format', choices=sorted(STREAM_FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to, defaults to stdout')
+    
+    def handle(self, *args, **options):
+        as_of = timezone.now().date()
+        if options['as_of']:
+            try:
+                as_of = parse_date(options['as_of'])
+            except ValueError:
+                as_of = None
+            if as_of is None:
+                raise CommandError(f"Invalid --as-of date: {options['as_of']}")
+        
+        rows = iter_aging_rows(as_of)
+        if options['output']:
+            with open(options['output'], 'w', newline='') as stream:
+                write_stream(stream, options['format'], AGING_FIELDS, rows)
+        else:
+            write_stream(self.stdout, options['format'], AGING_FIELDS, rows)
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products.design_batching import run_design_batching
+
+class Command(BaseCommand):
+    help = 'Combine approved custom designs with the same fingerprint into one production order each'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--min-designs', type=int, default=1, help='Leave smaller groups for a later run')
+        parser.add_argument('--created-by', help='Username recorded on the orders, defaults to the first superuser')
+    
+    def handle(self, *args, **options):
+        if options['created_by']:
+            created_by = User.objects.filter(username=options['created_by']).first()
+        else:
+            created_by = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if created_by is None:
+            raise CommandError('No user found to record as order creator')
+        
+        orders, designs = run_design_batching(created_by, min_designs=options['min_designs'])
+        self.stdout.write(self.style.SUCCESS(f'Created {orders} production orders covering {designs} designs'))
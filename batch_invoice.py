@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from products.invoicing import run_batch_invoicing
+
+class Command(BaseCommand):
+    help = 'Invoice completed, uninvoiced production orders, one invoice per wholesale customer'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Invoice date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Order lines per transaction')
+        parser.add_argument('--status', choices=['draft', 'sent'], default='sent')
+        parser.add_argument('--created-by', help='Username recorded on the invoices, defaults to the first superuser')
+    
+    def handle(self, *args, **options):
+        invoice_date = None
+        if options['date']:
+            try:
+                invoice_date = parse_date(options['date'])
+            except ValueError:
+                invoice_date = None
+            if invoice_date is None:
+                raise CommandError(f"Invalid --date: {options['date']}")
+        
+        if options['created_by']:
+            created_by = User.objects.filter(username=options['created_by']).first()
+        else:
+            created_by = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if created_by is None:
+            raise CommandError('No user found to record as invoice creator')
+        
+        invoices, orders = run_batch_invoicing(
+            created_by,
+            invoice_date=invoice_date,
+            chunk_size=options['chunk_size'],
+            status=options['status'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Created {invoices} invoices with {orders} order lines'))
@@ -0,0 +1,177 @@
+# Latency and query-count benchmarks for the web views and API list endpoints
+import json
+import math
+import time
+from contextlib import ExitStack
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+
+from accounting.models import Invoice
+from .models import FootwearCategory, FootwearProduct, SizeConversion
+from .synthetic import SKU_PREFIX
+
+CATALOG_PAGE_SIZE = 12
+
+# DRF router names of the list endpoints, tried with and without the api namespace
+API_LISTS = {
+    'api_products': 'footwearproduct-list',
+    'api_materials': 'material-list',
+    'api_customers': 'wholesalecustomer-list',
+    'api_designs': 'customdesign-list',
+    'api_orders': 'productionorder-list',
+    'api_invoices': 'invoice-list',
+}
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _url(name, **params):
+    url = reverse(name)
+    return f'{url}?{urlencode(params)}' if params else url
+
+def _api_url(route, **params):
+    for name in (f'api:{route}', route):
+        try:
+            return _url(name, **params)
+        except NoReverseMatch:
+            continue
+    return None
+
+def scenarios(staff, customer):
+    """
+    [(name, user or None, method, url or None, data)] over the current dataset.
+
+    Parameters come from the synthetic data so every run requests the same
+    pages. A url of None means the route is not installed.
+    """
+    products = FootwearProduct.objects.filter(active=True, sku__startswith=SKU_PREFIX)
+    product = products.order_by('sku').first()
+    category = FootwearCategory.objects.filter(slug__startswith='syn-category-').order_by('slug').first()
+    last_page = max(1, math.ceil(FootwearProduct.objects.filter(active=True).count() / CATALOG_PAGE_SIZE))
+    size = SizeConversion.objects.filter(size_chart__region='US', size_chart__gender='M').order_by('length_mm').first()
+
+    found = [
+        ('home', None, 'get', _url('web:home'), None),
+        ('product_catalog', None, 'get', _url('web:catalog'), None),
+        ('product_catalog_search', None, 'get', _url('web:catalog', search='Shoe 12'), None),
+        ('product_catalog_filters', None, 'get', _url('web:catalog', category=category.pk if category else '', gender='M'), None),
+        ('product_catalog_deep_page', None, 'get', _url('web:catalog', page=last_page), None),
+        ('product_detail', None, 'get', reverse('web:product_detail', args=[product.pk]) if product else None, None),
+        ('dashboard', customer, 'get', _url('web:dashboard'), None),
+        ('admin_dashboard', staff, 'get', _url('web:admin_dashboard'), None),
+        ('size_converter', customer, 'get', _url('web:size_converter'), None),
+        ('size_converter_convert', customer, 'post', _url('web:size_converter'), {
+            'from_size': size.size_value if size else '', 'from_region': 'US', 'to_region': 'US', 'gender': 'M',
+        }),
+    ]
+    for name, route in API_LISTS.items():
+        found.append((name, staff, 'get', _api_url(route), None))
+    found.append(('api_orders_expanded', staff, 'get', _api_url(API_LISTS['api_orders'], expand='product,custom_design'), None))
+    found.append(('api_products_deep_page', staff, 'get', _api_url(API_LISTS['api_products'], page=last_page), None))
+    return found
+
+def benchmark_staff():
+    staff, created = User.objects.get_or_create(
+        username='benchmark_staff', defaults={'is_staff': True, 'is_superuser': True, 'password': '!'}
+    )
+    return staff
+
+def benchmark_users():
+    """(staff user, the wholesale customer's user with the most invoices)"""
+    staff = benchmark_staff()
+    busiest = Invoice.objects.filter(wholesale_customer__isnull=False).values('customer_id').annotate(
+        invoice_count=Count('pk')
+    ).order_by('-invoice_count', 'customer_id').first()
+    customer = User.objects.filter(pk=busiest['customer_id']).first() if busiest else None
+    return staff, customer or staff
+
+def measure(client, method, url, data, iterations, warmup):
+    """(status, [milliseconds], max queries) of repeated requests"""
+    send = getattr(client, method)
+    for attempt in range(warmup):
+        send(url, data)
+    timings = []
+    queries = 0
+    status = None
+    for attempt in range(iterations):
+        with ExitStack() as stack:
+            # Replica-routed reads run on another alias and count too
+            captured = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+            started = time.perf_counter()
+            response = send(url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+        status = response.status_code
+        queries = max(queries, sum(len(c.captured_queries) for c in captured))
+    return status, timings, queries
+
+def check_budget(result, budget):
+    """Budget lines the result breaks; a missing budget is a failure so new scenarios get one"""
+    failures = []
+    if result['status'] != 200:
+        failures.append(f"status {result['status']}")
+    if budget is None:
+        return failures + ['no budget']
+    for key in ('p50_ms', 'p95_ms', 'queries'):
+        if key in budget and result[key] > budget[key]:
+            failures.append(f'{key} {result[key]} > {budget[key]}')
+    return failures
+
+def run_benchmarks(budgets, iterations=20, warmup=2, only=None):
+    """
+    Run every scenario and compare it with budgets ({name: {p50_ms, p95_ms, queries}}).
+
+    Returns {name: result} where a result holds url, status, p50_ms,
+    p95_ms, queries, budget and failures; scenarios whose route is not
+    installed are reported with skipped set instead.
+    """
+    staff, customer = benchmark_users()
+    clients = {}
+    results = {}
+    for name, user, method, url, data in scenarios(staff, customer):
+        if only and name not in only:
+            continue
+        if url is None:
+            results[name] = {'skipped': 'route not installed'}
+            continue
+        if user not in clients:
+            clients[user] = Client()
+            if user is not None:
+                clients[user].force_login(user)
+        status, timings, queries = measure(clients[user], method, url, data, iterations, warmup)
+        result = {
+            'url': url,
+            'method': method.upper(),
+            'status': status,
+            'p50_ms': round(percentile(timings, 0.5), 1),
+            'p95_ms': round(percentile(timings, 0.95), 1),
+            'queries': queries,
+            'budget': budgets.get(name),
+        }
+        result['failures'] = check_budget(result, result['budget'])
+        results[name] = result
+    return results
+
+def budgets_from(results, headroom=2.0):
+    """New budgets: measured query counts, latencies with headroom for slower machines"""
+    return {
+        name: {
+            'p50_ms': math.ceil(result['p50_ms'] * headroom),
+            'p95_ms': math.ceil(result['p95_ms'] * headroom),
+            'queries': result['queries'],
+        }
+        for name, result in results.items()
+        if 'skipped' not in result
+    }
+
+def dump(data, stream):
+    """Stable JSON, so runs compare as line diffs"""
+    json.dump(data, stream, indent=2, sort_keys=True, default=str)
+    stream.write('\n')
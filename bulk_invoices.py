@@ -0,0 +1,143 @@
+# Bulk invoice creation for ERP batch pushes
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from accounting.models import Invoice, InvoiceItem
+from products.credit import apply_balance_changes, invoice_balances
+from products.documents import refresh_invoice_documents
+from products.invoicing import wholesale_unit_price
+from products.models import FootwearProduct, WholesaleCustomer
+from products.tax import calculate_tax, rate_for
+from .serializers import BulkInvoiceRowSerializer
+
+MAX_BULK_INVOICES = 1000
+
+def _preload(rows):
+    """Fetch every referenced product, user and wholesale customer with one query each"""
+    product_ids = {item['product'] for row in rows for item in row['items'] if item.get('product')}
+    user_ids = {row['customer'] for row in rows}
+    wholesale_ids = {row['wholesale_customer'] for row in rows if row.get('wholesale_customer')}
+    products = FootwearProduct.objects.only('pk', 'name', 'sku', 'base_price').in_bulk(product_ids)
+    users = User.objects.only('pk', 'email').in_bulk(user_ids)
+    wholesale = WholesaleCustomer.objects.in_bulk(wholesale_ids)
+    return products, users, wholesale
+
+def _reference_errors(row, products, users, wholesale):
+    errors = {}
+    if row['customer'] not in users:
+        errors['customer'] = ['Unknown user.']
+    customer = wholesale.get(row.get('wholesale_customer'))
+    if row.get('wholesale_customer'):
+        if customer is None:
+            errors['wholesale_customer'] = ['Unknown wholesale customer.']
+        elif customer.user_id != row['customer']:
+            errors['wholesale_customer'] = ['Wholesale customer does not belong to this user.']
+    item_errors = {}
+    for position, item in enumerate(row['items']):
+        if item.get('product') and item['product'] not in products:
+            item_errors[position] = {'product': ['Unknown product.']}
+    if item_errors:
+        errors['items'] = item_errors
+    return errors
+
+def bulk_create_invoices(payload, created_by):
+    """
+    Validate and create a list of invoices with their items.
+
+    Every row is validated first; referenced objects are loaded once for
+    the whole batch and tax rates come from the cached tax engine. Valid
+    rows are then written with bulk_create in a single transaction, while
+    invalid rows are reported by index and skipped.
+    Returns (created, errors) as lists of dicts.
+    """
+    errors = []
+    rows = []
+    for index, data in enumerate(payload[:MAX_BULK_INVOICES]):
+        serializer = BulkInvoiceRowSerializer(data=data)
+        if serializer.is_valid():
+            rows.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+    for index in range(MAX_BULK_INVOICES, len(payload)):
+        errors.append({'index': index, 'errors': {'non_field_errors': [f'At most {MAX_BULK_INVOICES} invoices per request.']}})
+
+    products, users, wholesale = _preload([row for index, row in rows])
+    today = timezone.now().date()
+    due_days = settings.FOOTWEAR_SETTINGS['INVOICE_DUE_DAYS']
+
+    invoices = []
+    lines_by_invoice = []
+    for index, row in rows:
+        problems = _reference_errors(row, products, users, wholesale)
+        if problems:
+            errors.append({'index': index, 'errors': problems})
+            continue
+
+        customer = wholesale.get(row.get('wholesale_customer'))
+        discount = customer.get_discount_percentage() if customer else 0
+        lines = []
+        for item in row['items']:
+            product = products.get(item.get('product'))
+            unit_price = item.get('unit_price')
+            if unit_price is None:
+                unit_price = wholesale_unit_price(product, item['quantity'], discount)
+            description = item.get('description') or (product.name if product else '')
+            lines.append((product, description, item['quantity'], unit_price))
+
+        invoice_date = row.get('invoice_date') or today
+        payment_terms = customer.payment_terms if customer else due_days
+        rate = rate_for(row.get('tax_jurisdiction'), invoice_date)
+        subtotal, tax_amount, _ = calculate_tax(
+            [unit_price * quantity for product, description, quantity, unit_price in lines], rate
+        )
+        user = users[row['customer']]
+        invoice = Invoice(
+            invoice_number=f"INV{invoice_date.strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}",
+            customer_id=row['customer'],
+            wholesale_customer=customer,
+            invoice_date=invoice_date,
+            due_date=row.get('due_date') or invoice_date + timedelta(days=payment_terms),
+            billing_name=row.get('billing_name') or (customer.business_name if customer else ''),
+            billing_address=row.get('billing_address') or (customer.billing_address if customer else ''),
+            billing_email=row.get('billing_email') or (customer.email if customer else user.email),
+            billing_phone=row.get('billing_phone') or (customer.phone if customer else ''),
+            tax_id=row.get('tax_id') or (customer.tax_id if customer else ''),
+            notes=row.get('notes', ''),
+            terms_conditions=row.get('terms_conditions', ''),
+            subtotal=subtotal,
+            tax_rate=rate,
+            tax_amount=tax_amount,
+            total_amount=subtotal + tax_amount,
+            created_by=created_by,
+        )
+        invoices.append(invoice)
+        lines_by_invoice.append((index, invoice, lines))
+
+    with transaction.atomic():
+        Invoice.objects.bulk_create(invoices, batch_size=500)
+        InvoiceItem.objects.bulk_create([
+            InvoiceItem(
+                invoice=invoice,
+                product=product,
+                description=description,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=unit_price * quantity,
+            )
+            for index, invoice, lines in lines_by_invoice
+            for product, description, quantity, unit_price in lines
+        ], batch_size=1000)
+        apply_balance_changes({}, invoice_balances([invoice.pk for invoice in invoices]))
+        refresh_invoice_documents(invoice.pk for invoice in invoices if invoice.status != 'draft')
+
+    created = [
+        {'index': index, 'id': invoice.pk, 'invoice_number': invoice.invoice_number, 'total_amount': invoice.total_amount}
+        for index, invoice, lines in lines_by_invoice
+    ]
+    errors.sort(key=lambda error: error['index'])
+    return created, errors
@@ -0,0 +1,272 @@
+# Bulk catalog import with batched upserts and a dry-run diff
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .design_pricing import clear_design_price_cache
+from .models import BillOfMaterials, FootwearCategory, FootwearProduct, Material, SizeConversion
+from .pricing import refresh_price_lists
+
+IMPORT_FORMATS = ['csv', 'ndjson', 'json']
+
+# Columns of a product row; sizes, materials and bom are lists (JSON text in CSV)
+PRODUCT_FIELDS = [
+    'name', 'description', 'gender', 'base_price', 'heel_height', 'sole_thickness',
+    'weight', 'customizable', 'production_time_days', 'minimum_order_quantity', 'active',
+]
+DECIMAL_FIELDS = {'base_price', 'heel_height', 'sole_thickness', 'weight'}
+INTEGER_FIELDS = {'production_time_days', 'minimum_order_quantity'}
+BOOLEAN_FIELDS = {'customizable', 'active'}
+NESTED_FIELDS = ['sizes', 'materials', 'bom']
+GENDERS = {value for value, label in FootwearProduct.GENDER_CHOICES}
+
+def read_records(stream, fmt):
+    """
+    Yield (line number, record dict) from a catalog file.
+
+    csv: one product per row, the sizes, materials and bom columns hold
+    JSON lists; ndjson: one product object per line; json: a list of
+    product objects.
+    """
+    if fmt == 'csv':
+        yield from enumerate(csv.DictReader(stream), start=2)
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
+    else:
+        for index, record in enumerate(json.load(stream), start=1):
+            yield index, record
+
+def material_key(name, color):
+    """'Premium Leather (Brown)', the form materials are referenced by"""
+    return f'{name} ({color})'
+
+def size_key(region, gender, value):
+    """'US/M/9', the form sizes are referenced by"""
+    return f'{region}/{gender}/{value}'
+
+def _lookups():
+    """Categories, materials and sizes by natural key, one query each"""
+    categories = dict(FootwearCategory.objects.values_list('slug', 'pk'))
+    materials = {
+        material_key(name, color): pk
+        for pk, name, color in Material.objects.values_list('pk', 'name', 'color')
+    }
+    sizes = {
+        size_key(region, gender, value): pk
+        for pk, region, gender, value in SizeConversion.objects.values_list(
+            'pk', 'size_chart__region', 'size_chart__gender', 'size_value'
+        )
+    }
+    return categories, materials, sizes
+
+def _parse_value(name, value):
+    if name in DECIMAL_FIELDS:
+        return Decimal(str(value))
+    if name in INTEGER_FIELDS:
+        return int(value)
+    if name in BOOLEAN_FIELDS:
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+    return str(value)
+
+def _parse(record, categories, materials, sizes):
+    """(fields, category id, size ids, material ids, bom) of a record; raises ValueError"""
+    for name in ('sku', 'name', 'category', 'gender', 'base_price'):
+        if record.get(name) in (None, ''):
+            raise ValueError(f'{name} is required')
+    if not isinstance(record['category'], str) or record['category'] not in categories:
+        raise ValueError(f"Unknown category \"{record['category']}\"")
+    if not isinstance(record['gender'], str) or record['gender'] not in GENDERS:
+        raise ValueError(f"Invalid gender \"{record['gender']}\"")
+    try:
+        # Blank or missing columns keep the current value
+        fields = {
+            name: _parse_value(name, record[name])
+            for name in PRODUCT_FIELDS
+            if record.get(name) not in (None, '')
+        }
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError('Invalid number in product fields')
+    for name in NESTED_FIELDS:
+        if isinstance(record.get(name), str):
+            try:
+                record[name] = json.loads(record[name]) if record[name].strip() else []
+            except ValueError:
+                raise ValueError(f'{name} must be a JSON list')
+        if record.get(name) is not None and not isinstance(record[name], list):
+            raise ValueError(f'{name} must be a list')
+
+    # Likewise a missing list keeps the product's current sizes, materials or BOM
+    size_ids = material_ids = bom = None
+    if record.get('sizes') is not None:
+        size_ids = set()
+        for reference in record['sizes']:
+            if not isinstance(reference, str) or reference not in sizes:
+                raise ValueError(f'Unknown size "{reference}"')
+            size_ids.add(sizes[reference])
+    if record.get('materials') is not None:
+        material_ids = set()
+        for reference in record['materials']:
+            if not isinstance(reference, str) or reference not in materials:
+                raise ValueError(f'Unknown material "{reference}"')
+            material_ids.add(materials[reference])
+    if record.get('bom') is not None:
+        bom = {}
+    for line in record.get('bom') or []:
+        if not isinstance(line, dict):
+            raise ValueError('BOM lines must be objects')
+        if not isinstance(line.get('material'), str) or line['material'] not in materials:
+            raise ValueError(f"Unknown BOM material \"{line.get('material')}\"")
+        try:
+            quantity = Decimal(str(line['quantity']))
+        except (KeyError, InvalidOperation):
+            raise ValueError('BOM lines need a numeric quantity')
+        bom[(materials[line['material']], str(line.get('component', '')))] = (quantity, str(line.get('notes', '')))
+    return fields, categories[record['category']], size_ids, material_ids, bom
+
+def _existing(skus):
+    """Current state of the products in a chunk, keyed by sku, four queries in all"""
+    products = {
+        row['sku']: row
+        for row in FootwearProduct.objects.filter(sku__in=skus).values('pk', 'sku', 'category_id', *PRODUCT_FIELDS)
+    }
+    by_pk = {row['pk']: row for row in products.values()}
+    for row in by_pk.values():
+        row.update(sizes=set(), materials=set(), bom={})
+    for product_id, size_id in FootwearProduct.available_sizes.through.objects.filter(
+        footwearproduct_id__in=by_pk
+    ).values_list('footwearproduct_id', 'sizeconversion_id'):
+        by_pk[product_id]['sizes'].add(size_id)
+    for product_id, material_id in FootwearProduct.available_materials.through.objects.filter(
+        footwearproduct_id__in=by_pk
+    ).values_list('footwearproduct_id', 'material_id'):
+        by_pk[product_id]['materials'].add(material_id)
+    for product_id, material_id, component, quantity, notes in BillOfMaterials.objects.filter(
+        product_id__in=by_pk
+    ).values_list('product_id', 'material_id', 'component_name', 'quantity_required', 'notes'):
+        by_pk[product_id]['bom'][(material_id, component)] = (quantity, notes)
+    return products
+
+def _diff(current, fields, category_id, size_ids, material_ids, bom):
+    """Names of what an import row would change on an existing product"""
+    changed = [name for name, value in fields.items() if current[name] != value]
+    if current['category_id'] != category_id:
+        changed.append('category')
+    for name, value in (('sizes', size_ids), ('materials', material_ids), ('bom', bom)):
+        if value is not None and current[name] != value:
+            changed.append(name)
+    return changed
+
+def _write_chunk(rows, existing):
+    """Upsert changed products, then replace their size, material and BOM rows"""
+    model_defaults = {name: FootwearProduct._meta.get_field(name).get_default() for name in PRODUCT_FIELDS}
+    model_defaults['description'] = ''
+    products = []
+    resolved = []
+    for sku, fields, category_id, size_ids, material_ids, bom in rows:
+        current = existing.get(sku, {'sizes': set(), 'materials': set(), 'bom': {}})
+        values = {**model_defaults, **{name: current[name] for name in PRODUCT_FIELDS if name in current}}
+        values.update(fields)
+        products.append(FootwearProduct(sku=sku, category_id=category_id, **values))
+        resolved.append((
+            sku, fields, category_id,
+            current['sizes'] if size_ids is None else size_ids,
+            current['materials'] if material_ids is None else material_ids,
+            current['bom'] if bom is None else bom,
+        ))
+    rows = resolved
+
+    with transaction.atomic():
+        FootwearProduct.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=['category', 'updated_at', *PRODUCT_FIELDS],
+        )
+        # Upserted rows don't get their pk back on every backend
+        ids = dict(FootwearProduct.objects.filter(sku__in=[row[0] for row in rows]).values_list('sku', 'pk'))
+        product_ids = list(ids.values())
+
+        SizeThrough = FootwearProduct.available_sizes.through
+        MaterialThrough = FootwearProduct.available_materials.through
+        SizeThrough.objects.filter(footwearproduct_id__in=product_ids).delete()
+        MaterialThrough.objects.filter(footwearproduct_id__in=product_ids).delete()
+        BillOfMaterials.objects.filter(product_id__in=product_ids).delete()
+        SizeThrough.objects.bulk_create([
+            SizeThrough(footwearproduct_id=ids[row[0]], sizeconversion_id=size_id)
+            for row in rows for size_id in row[3]
+        ], batch_size=5000)
+        MaterialThrough.objects.bulk_create([
+            MaterialThrough(footwearproduct_id=ids[row[0]], material_id=material_id)
+            for row in rows for material_id in row[4]
+        ], batch_size=5000)
+        BillOfMaterials.objects.bulk_create([
+            BillOfMaterials(
+                product_id=ids[row[0]], material_id=material_id, component_name=component,
+                quantity_required=quantity, notes=notes,
+            )
+            for row in rows for (material_id, component), (quantity, notes) in row[5].items()
+        ], batch_size=5000)
+        # bulk writes skip the signals that keep these in step
+        refresh_price_lists(product_ids)
+        clear_design_price_cache(product_ids)
+
+def import_catalog(records, dry_run=False, chunk_size=1000):
+    """
+    Import (line number, record) pairs and return a diff report.
+
+    Categories, materials and sizes are resolved from in-memory maps
+    (unknown references are errors, nothing is created for them). Each
+    chunk of records is compared with the database in four queries; only
+    new and changed products are written, with one upsert for the
+    products and a delete-and-insert of their sizes, materials and BOM
+    lines. With dry_run nothing is written.
+    The report is a list of {'line', 'sku', 'action', 'changes'|'error'}
+    with action one of create, update, unchanged, error.
+    """
+    categories, materials, sizes = _lookups()
+    report = []
+    chunk = []
+
+    def flush():
+        existing = _existing([sku for line_number, sku, parsed in chunk])
+        pending = []
+        for line_number, sku, (fields, category_id, size_ids, material_ids, bom) in chunk:
+            if sku in existing:
+                changes = _diff(existing[sku], fields, category_id, size_ids, material_ids, bom)
+                action = 'update' if changes else 'unchanged'
+            else:
+                changes = []
+                action = 'create'
+            report.append({'line': line_number, 'sku': sku, 'action': action, 'changes': changes})
+            if action != 'unchanged':
+                pending.append((sku, fields, category_id, size_ids, material_ids, bom))
+        if pending and not dry_run:
+            _write_chunk(pending, existing)
+        chunk.clear()
+
+    seen = set()
+    for line_number, record in records:
+        if not isinstance(record, dict):
+            report.append({'line': line_number, 'sku': '', 'action': 'error', 'error': 'Expected an object'})
+            continue
+        sku = str(record.get('sku') or '').strip()
+        try:
+            if sku in seen:
+                raise ValueError('Duplicate sku in this file')
+            parsed = _parse({**record, 'sku': sku}, categories, materials, sizes)
+        except ValueError as e:
+            report.append({'line': line_number, 'sku': sku, 'action': 'error', 'error': str(e)})
+            continue
+        seen.add(sku)
+        chunk.append((line_number, sku, parsed))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
@@ -0,0 +1,120 @@
+# Incremental catalog change feed for partner sync
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import CatalogTombstone, FootwearProduct, Material, PriceListEntry, SizeConversion
+
+MAX_SYNC_PAGE = 5000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+PRODUCT_FIELDS = [
+    'id', 'sku', 'name', 'category_id', 'gender', 'description', 'base_price',
+    'heel_height', 'sole_thickness', 'weight', 'customizable',
+    'production_time_days', 'minimum_order_quantity', 'active', 'updated_at',
+]
+MATERIAL_FIELDS = [
+    'id', 'name', 'material_type', 'color', 'supplier', 'cost_per_unit',
+    'unit_of_measure', 'minimum_order', 'lead_time_days', 'updated_at',
+]
+SIZE_FIELDS = ['id', 'size_chart_id', 'size_value', 'length_mm', 'width_mm', 'updated_at']
+PRICE_FIELDS = ['id', 'product_id', 'discount_tier', 'min_quantity', 'unit_price', 'updated_at']
+TOMBSTONE_FIELDS = ['id', 'kind', 'object_id', 'deleted_at']
+
+def encode_cursor(changed_at, kind_index, pk):
+    return f'{(changed_at - EPOCH) // MICROSECOND}-{kind_index}-{pk}'
+
+def decode_cursor(cursor):
+    """(changed_at, kind index, pk), or None for an empty cursor; ValueError when malformed"""
+    if not cursor:
+        return None
+    micros, kind_index, pk = (int(part) for part in cursor.split('-'))
+    return EPOCH + micros * MICROSECOND, kind_index, pk
+
+def _feeds(discount_tier):
+    """(key, queryset, timestamp field) in cursor order; the position is the kind index"""
+    prices = PriceListEntry.objects.values(*PRICE_FIELDS)
+    if discount_tier is not None:
+        prices = prices.filter(discount_tier=discount_tier)
+    return [
+        ('products', FootwearProduct.objects.values(*PRODUCT_FIELDS), 'updated_at'),
+        ('materials', Material.objects.values(*MATERIAL_FIELDS), 'updated_at'),
+        ('sizes', SizeConversion.objects.values(*SIZE_FIELDS, region=F('size_chart__region'), size_gender=F('size_chart__gender')), 'updated_at'),
+        ('prices', prices, 'updated_at'),
+        ('deleted', CatalogTombstone.objects.values(*TOMBSTONE_FIELDS), 'deleted_at'),
+    ]
+
+def _after(queryset, field, kind_index, cursor):
+    """Rows strictly after the cursor in (timestamp, kind, pk) order"""
+    if cursor is None:
+        return queryset
+    changed_at, cursor_kind, cursor_pk = cursor
+    after = Q(**{f'{field}__gt': changed_at})
+    if kind_index > cursor_kind:
+        after |= Q(**{field: changed_at})
+    elif kind_index == cursor_kind:
+        after |= Q(**{field: changed_at, 'pk__gt': cursor_pk})
+    return queryset.filter(after)
+
+def catalog_changes(cursor=None, limit=500, discount_tier=None):
+    """
+    Catalog rows changed or deleted after a cursor, oldest first.
+
+    Every row sits in one total order of (updated_at, kind, pk), so the
+    returned cursor only ever moves forward and a client that keeps
+    passing it back sees each change once. Rows changed in the last
+    CATALOG_SYNC_SETTLE_SECONDS are held back until the next call, so
+    a transaction that commits late cannot slip behind a cursor already
+    handed out. discount_tier limits prices to one tier (None for all).
+    """
+    position = decode_cursor(cursor)
+    limit = max(1, min(limit, MAX_SYNC_PAGE))
+    until = timezone.now() - timedelta(seconds=settings.FOOTWEAR_SETTINGS['CATALOG_SYNC_SETTLE_SECONDS'])
+
+    rows = []
+    feeds = _feeds(discount_tier)
+    for kind_index, (key, queryset, field) in enumerate(feeds):
+        queryset = _after(queryset.filter(**{f'{field}__lte': until}), field, kind_index, position)
+        # One row past the limit tells us whether another page follows
+        for row in queryset.order_by(field, 'pk')[:limit + 1]:
+            rows.append((row[field], kind_index, row['id'], row))
+    rows.sort(key=lambda row: row[:3])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = {key: [] for key, queryset, field in feeds}
+    for changed_at, kind_index, pk, row in rows:
+        changes[feeds[kind_index][0]].append(row)
+    _attach_options(changes['products'])
+
+    next_cursor = encode_cursor(*rows[-1][:3]) if rows else cursor or ''
+    return {**changes, 'cursor': next_cursor, 'has_more': has_more}
+
+def _attach_options(products):
+    """Add size and material id lists to product rows, one query per list"""
+    product_ids = [product['id'] for product in products]
+    if not product_ids:
+        return
+    sizes = defaultdict(list)
+    through = FootwearProduct.available_sizes.through.objects.filter(footwearproduct_id__in=product_ids)
+    for product_id, size_id in through.values_list('footwearproduct_id', 'sizeconversion_id'):
+        sizes[product_id].append(size_id)
+    materials = defaultdict(list)
+    through = FootwearProduct.available_materials.through.objects.filter(footwearproduct_id__in=product_ids)
+    for product_id, material_id in through.values_list('footwearproduct_id', 'material_id'):
+        materials[product_id].append(material_id)
+    for product in products:
+        product['size_ids'] = sizes[product['id']]
+        product['material_ids'] = materials[product['id']]
+
+def touch_products(product_ids):
+    """Move products to the head of the feed after a change that skips save()"""
+    FootwearProduct.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+
+def record_deletion(kind, object_id):
+    CatalogTombstone.objects.create(kind=kind, object_id=object_id)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from products.credit import check_credit_balances
+
+class Command(BaseCommand):
+    help = 'Recompute wholesale customer balances from invoices, payments and credit holds'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Correct balances that differ')
+    
+    def handle(self, *args, **options):
+        mismatches = check_credit_balances(fix=options['fix'])
+        for customer, stored, expected in mismatches:
+            self.stdout.write(self.style.WARNING(
+                f'{customer.business_name}: stored {stored}, expected {expected}'
+            ))
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('All customer balances are consistent'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {len(mismatches)} customer balances'))
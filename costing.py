@@ -0,0 +1,202 @@
+# Incremental FIFO / weighted-average inventory costing
+from collections import deque
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounting.models import InvoiceItem
+from .models import CostLayer, FootwearProduct, InventoryMovement, ProductionOrder
+
+CENT = Decimal('0.01')
+UNIT_COST_PLACES = Decimal('0.000001')
+
+def costing_method():
+    return settings.FOOTWEAR_SETTINGS.get('INVENTORY_COSTING_METHOD', 'fifo')
+
+def _money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def _new_receipts():
+    """Completed production orders not yet costed into inventory"""
+    costed = InventoryMovement.objects.filter(source_type='production').values('source_id')
+    return ProductionOrder.objects.filter(status='completed').exclude(pk__in=costed).annotate(
+        completed_on=Coalesce('actual_completion', 'expected_completion'),
+    ).values_list('pk', 'product_id', 'completed_on', 'quantity', 'total_cost')
+
+def _new_issues():
+    """Invoiced product lines not yet issued from inventory"""
+    costed = InventoryMovement.objects.filter(source_type='invoice').values('source_id')
+    return InvoiceItem.objects.filter(product__isnull=False).exclude(
+        invoice__status__in=['draft', 'cancelled']
+    ).exclude(pk__in=costed).values_list('pk', 'product_id', 'invoice__invoice_date', 'quantity')
+
+class _ProductState:
+    """Running balance and open cost layers of one product during a run"""
+    def __init__(self, quantity=0, value=Decimal('0.00'), last_date=None, layers=()):
+        self.quantity = quantity
+        self.value = value
+        self.last_date = last_date
+        self.layers = deque(layers)
+        self.last_unit_cost = layers[-1].unit_cost if layers else None
+        self.touched_layers = {}
+
+    def unit_cost(self):
+        if self.quantity > 0:
+            return self.value / self.quantity
+        return self.last_unit_cost or Decimal('0')
+
+    def receive(self, quantity, value, unit_cost):
+        """Add stock; returns how much of it is still open for FIFO issues"""
+        backordered = min(quantity, max(-self.quantity, 0))
+        self.quantity += quantity
+        self.value += value
+        self.last_unit_cost = unit_cost
+        return quantity - backordered
+
+    def issue(self, quantity, method):
+        """Remove stock and return its cost"""
+        if 0 < self.quantity <= quantity:
+            # Depleting the stock releases its full remaining value, leaving no rounding residue
+            cost = self.value + (quantity - self.quantity) * self.unit_cost()
+            self._consume_layers(self.quantity)
+        elif method == 'fifo':
+            cost, shortfall = self._consume_layers(quantity)
+            cost += shortfall * self.unit_cost()
+        else:
+            cost = quantity * self.unit_cost()
+        cost = _money(cost)
+        self.quantity -= quantity
+        self.value -= cost
+        return cost
+
+    def _consume_layers(self, quantity):
+        """Take quantity from the oldest layers; returns (cost, quantity not covered)"""
+        cost = Decimal('0')
+        while quantity and self.layers:
+            layer = self.layers[0]
+            take = min(quantity, layer.remaining_quantity)
+            cost += take * layer.unit_cost
+            layer.remaining_quantity -= take
+            quantity -= take
+            if layer.pk:
+                self.touched_layers[layer.pk] = layer
+            if not layer.remaining_quantity:
+                self.layers.popleft()
+        return cost, quantity
+
+def _load_states(product_ids):
+    """Latest balance and open FIFO layers for the products touched by a run"""
+    latest = InventoryMovement.objects.filter(product=OuterRef('pk')).order_by('-movement_date', '-pk')
+    balances = FootwearProduct.objects.filter(pk__in=product_ids).annotate(
+        balance_quantity=Subquery(latest.values('balance_quantity')[:1]),
+        balance_value=Subquery(latest.values('balance_value')[:1]),
+        last_date=Subquery(latest.values('movement_date')[:1]),
+    ).values_list('pk', 'balance_quantity', 'balance_value', 'last_date')
+
+    layers = {}
+    open_layers = CostLayer.objects.filter(
+        product_id__in=product_ids, remaining_quantity__gt=0
+    ).order_by('received_date', 'pk')
+    for layer in open_layers:
+        layers.setdefault(layer.product_id, []).append(layer)
+
+    states = {}
+    for pk, quantity, value, last_date in balances:
+        states[pk] = _ProductState(
+            quantity=quantity or 0,
+            value=value if value is not None else Decimal('0.00'),
+            last_date=last_date,
+            layers=layers.get(pk, []),
+        )
+    return states
+
+def run_costing(method=None):
+    """
+    Cost every receipt and issue recorded since the previous run.
+
+    Movements already costed are skipped, so the job is incremental and safe
+    to re-run. Each movement stores the product's balance after it, which is
+    what valuation_as_of() reads instead of replaying history. A movement
+    dated before the product's last costed movement is posted on that later
+    date so the running balances stay in date order.
+    Returns the number of movements costed.
+    """
+    method = method or costing_method()
+
+    # (date, receipts before issues on the same day, source id)
+    events = [
+        (completed_on, 0, pk, product_id, quantity, total_cost)
+        for pk, product_id, completed_on, quantity, total_cost in _new_receipts()
+    ]
+    events += [
+        (invoice_date, 1, pk, product_id, quantity, None)
+        for pk, product_id, invoice_date, quantity in _new_issues()
+    ]
+    if not events:
+        return 0
+    events.sort(key=lambda event: event[:3])
+
+    with transaction.atomic():
+        states = _load_states({event[3] for event in events})
+        movements = []
+        new_layers = []
+
+        for event_date, kind, source_id, product_id, quantity, total_cost in events:
+            state = states[product_id]
+            if state.last_date and event_date < state.last_date:
+                event_date = state.last_date
+            state.last_date = event_date
+
+            if kind == 0:
+                value = _money(total_cost or Decimal('0'))
+                unit_cost = (value / quantity).quantize(UNIT_COST_PLACES)
+                open_quantity = state.receive(quantity, value, unit_cost)
+                movement = InventoryMovement(
+                    product_id=product_id, source_type='production', source_id=source_id,
+                    movement_date=event_date, quantity=quantity, value=value,
+                    balance_quantity=state.quantity, balance_value=state.value, method=method,
+                )
+                if method == 'fifo' and open_quantity:
+                    layer = CostLayer(
+                        product_id=product_id, receipt=movement, received_date=event_date,
+                        quantity=quantity, remaining_quantity=open_quantity, unit_cost=unit_cost,
+                    )
+                    state.layers.append(layer)
+                    new_layers.append(layer)
+            else:
+                value = state.issue(quantity, method)
+                movement = InventoryMovement(
+                    product_id=product_id, source_type='invoice', source_id=source_id,
+                    movement_date=event_date, quantity=-quantity, value=-value,
+                    balance_quantity=state.quantity, balance_value=state.value, method=method,
+                )
+            movements.append(movement)
+
+        InventoryMovement.objects.bulk_create(movements, batch_size=1000)
+        CostLayer.objects.bulk_create(new_layers, batch_size=1000)
+        touched_layers = [layer for state in states.values() for layer in state.touched_layers.values()]
+        CostLayer.objects.bulk_update(touched_layers, ['remaining_quantity'], batch_size=1000)
+
+    return len(movements)
+
+def valuation_as_of(as_of, product_ids=None):
+    """
+    {product_id: (quantity, value)} at the end of a date.
+
+    Reads the last costed movement on or before the date per product, an
+    indexed lookup rather than a replay of every movement.
+    """
+    latest = InventoryMovement.objects.filter(
+        product=OuterRef('pk'), movement_date__lte=as_of
+    ).order_by('-movement_date', '-pk')
+    products = FootwearProduct.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    rows = products.annotate(
+        balance_quantity=Subquery(latest.values('balance_quantity')[:1]),
+        balance_value=Subquery(latest.values('balance_value')[:1]),
+    ).filter(balance_quantity__isnull=False).values_list('pk', 'balance_quantity', 'balance_value')
+    return {pk: (quantity, value) for pk, quantity, value in rows}
@@ -0,0 +1,169 @@
+# Credit limit enforcement for wholesale customers
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounting.models import Invoice, Payment
+from .models import CreditHold, WholesaleCustomer
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+def reserve_credit(customer_id, amount, production_order=None):
+    """
+    Reserve credit for an order; returns the CreditHold, or None if over limit.
+
+    The check and the increment are one conditional UPDATE, so concurrent
+    orders from the same customer cannot both pass the limit and no row is
+    read and locked beforehand.
+    """
+    amount = Decimal(amount)
+    with transaction.atomic():
+        reserved = WholesaleCustomer.objects.filter(
+            pk=customer_id,
+            approved=True,
+            current_balance__lte=F('credit_limit') - amount,
+        ).update(current_balance=F('current_balance') + amount)
+        if not reserved:
+            return None
+        return CreditHold.objects.create(
+            customer_id=customer_id, production_order=production_order, amount=amount
+        )
+
+def reserve_credit_for_orders(customer_id, order_amounts):
+    """
+    Reserve the total of several new orders with a single conditional UPDATE.
+
+    order_amounts is a list of (production_order, amount); one hold is
+    written per order so each can be released on its own. Returns False,
+    reserving nothing, when the total would exceed the limit.
+    """
+    total = sum((Decimal(amount) for order, amount in order_amounts), Decimal('0.00'))
+    with transaction.atomic():
+        reserved = WholesaleCustomer.objects.filter(
+            pk=customer_id,
+            approved=True,
+            current_balance__lte=F('credit_limit') - total,
+        ).update(current_balance=F('current_balance') + total)
+        if not reserved:
+            return False
+        CreditHold.objects.bulk_create([
+            CreditHold(customer_id=customer_id, production_order=order, amount=amount)
+            for order, amount in order_amounts
+        ])
+        return True
+
+def release_credit(hold_id):
+    """Release an active hold (e.g. on cancellation); safe to call more than once"""
+    with transaction.atomic():
+        hold = CreditHold.objects.filter(pk=hold_id, status='active').values_list('customer_id', 'amount').first()
+        if hold is None:
+            return False
+        released = CreditHold.objects.filter(pk=hold_id, status='active').update(
+            status='released', released_at=timezone.now()
+        )
+        if released:
+            customer_id, amount = hold
+            WholesaleCustomer.objects.filter(pk=customer_id).update(
+                current_balance=F('current_balance') - amount
+            )
+        return bool(released)
+
+def release_order_holds(production_order_id):
+    hold_ids = CreditHold.objects.filter(
+        production_order_id=production_order_id, status='active'
+    ).values_list('pk', flat=True)
+    return sum(release_credit(hold_id) for hold_id in list(hold_ids))
+
+def mark_holds_invoiced(production_order_ids):
+    """
+    Invoiced orders are carried by their invoice balance from now on.
+
+    The holds' amounts leave current_balance here; the invoice total,
+    tax included, is added by whoever writes the invoice (see
+    apply_balance_changes), so the difference is never lost.
+    """
+    with transaction.atomic():
+        holds = list(CreditHold.objects.select_for_update().filter(
+            production_order_id__in=production_order_ids, status='active'
+        ).values_list('pk', 'customer_id', 'amount'))
+        released = {}
+        for hold_id, customer_id, amount in holds:
+            released[customer_id] = released.get(customer_id, Decimal('0.00')) + amount
+        CreditHold.objects.filter(pk__in=[hold[0] for hold in holds]).update(status='invoiced')
+        apply_balance_changes(released, {})
+    return len(holds)
+
+def _outstanding_by_customer(invoices):
+    """(wholesale customer id, open invoice total less completed payments) rows"""
+    paid = Payment.objects.filter(
+        invoice=OuterRef('pk'), status='completed'
+    ).values('invoice').annotate(total=Sum('amount')).values('total')
+    return invoices.filter(wholesale_customer__isnull=False).exclude(
+        status__in=['draft', 'cancelled']
+    ).annotate(
+        paid_amount=Coalesce(Subquery(paid, output_field=MONEY), Value(Decimal('0')), output_field=MONEY),
+    ).values('wholesale_customer_id').annotate(
+        outstanding=Sum(F('total_amount') - F('paid_amount'), output_field=MONEY),
+    ).values_list('wholesale_customer_id', 'outstanding')
+
+def invoice_balances(invoice_ids):
+    """{customer_id: amount} the given invoices add to their customers' balances"""
+    return {
+        customer_id: amount or Decimal('0.00')
+        for customer_id, amount in _outstanding_by_customer(Invoice.objects.filter(pk__in=invoice_ids))
+    }
+
+def apply_balance_changes(before, after):
+    """
+    Move current_balance by after - before for each customer.
+
+    before and after are invoice_balances() (or released hold amounts)
+    taken around a change to invoices or payments; the difference is
+    applied with F() updates so concurrent reservations are kept.
+    """
+    for customer_id in set(before) | set(after):
+        change = after.get(customer_id, Decimal('0.00')) - before.get(customer_id, Decimal('0.00'))
+        if change:
+            WholesaleCustomer.objects.filter(pk=customer_id).update(
+                current_balance=F('current_balance') + change
+            )
+
+def expected_balances():
+    """
+    {customer_id: balance} recomputed from open invoices and active holds.
+
+    Two aggregate queries, independent of the number of invoices.
+    """
+    balances = {}
+    for customer_id, amount in _outstanding_by_customer(Invoice.objects.all()):
+        balances[customer_id] = amount or Decimal('0.00')
+    holds = CreditHold.objects.filter(status='active').values('customer_id').annotate(
+        held=Sum('amount')
+    ).values_list('customer_id', 'held')
+    for customer_id, amount in holds:
+        balances[customer_id] = balances.get(customer_id, Decimal('0.00')) + amount
+    return balances
+
+def check_credit_balances(fix=False):
+    """
+    Compare each customer's current_balance with the recomputed balance.
+
+    Returns a list of (customer, stored, expected) for mismatches. With
+    fix=True each mismatch is corrected by its difference through an F()
+    update, so reservations made meanwhile are not overwritten.
+    """
+    expected = expected_balances()
+    mismatches = []
+    for customer in WholesaleCustomer.objects.only('pk', 'business_name', 'current_balance'):
+        balance = expected.get(customer.pk, Decimal('0.00'))
+        if customer.current_balance != balance:
+            mismatches.append((customer, customer.current_balance, balance))
+    if fix:
+        for customer, stored, balance in mismatches:
+            WholesaleCustomer.objects.filter(pk=customer.pk).update(
+                current_balance=F('current_balance') + (balance - stored)
+            )
+    return mismatches
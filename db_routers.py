@@ -0,0 +1,122 @@
+# Read-replica routing with read-your-writes stickiness
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+REPLICA = 'replica'
+PRIMARY = 'default'
+STICKY_COOKIE = 'primary_until'
+# Apps whose reads may go to the replica; sessions and auth always read the primary
+REPLICA_APPS = {'products', 'accounting'}
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+def _setting(name, default):
+    return settings.FOOTWEAR_SETTINGS.get(name, default)
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+@contextmanager
+def read_from_replica():
+    """Send reads inside the block to the replica, e.g. in reports and exports run outside a request"""
+    token = _read_alias.set(REPLICA if replica_configured() else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+def pinned_stream(content, alias):
+    """Iterate streaming content with reads routed to alias, for responses consumed after the view returns"""
+    iterator = iter(content)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+class ReplicaRouter:
+    """
+    Reads go to the replica only inside read_from_replica() or a request
+    routed there by ReplicaRoutingMiddleware; everything else, and every
+    write, uses the primary. The first write in a request pins its
+    remaining reads to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in REPLICA_APPS:
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if _read_alias.get() is not None:
+            # Read our own write; the middleware restores the alias afterwards
+            _read_alias.set(None)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        if db == REPLICA:
+            return False
+        return None
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of read-heavy GET views (REPLICA_VIEWS) to the replica.
+
+    After a request that may have written (any method but GET, HEAD or
+    OPTIONS) the client gets a cookie that keeps its requests on the
+    primary for REPLICA_STICKY_SECONDS, so it reads its own writes while
+    the replica catches up. Does nothing unless a replica is configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = replica_configured()
+        self.views = set(_setting('REPLICA_VIEWS', []))
+        self.sticky_seconds = int(_setting('REPLICA_STICKY_SECONDS', 10))
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        request._replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            token = request._replica_token
+            if token is not None:
+                _read_alias.reset(token)
+
+        if token is not None and response.streaming:
+            response.streaming_content = pinned_stream(response.streaming_content, REPLICA)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time()) + self.sticky_seconds),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled or request.method not in ('GET', 'HEAD'):
+            return None
+        if request.resolver_match is None or request.resolver_match.view_name not in self.views:
+            return None
+        try:
+            sticky_until = int(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0
+        if sticky_until > time.time():
+            return None
+        request._replica_token = _read_alias.set(REPLICA)
+        return None
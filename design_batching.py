@@ -0,0 +1,126 @@
+# Design fingerprints and combined production runs for identical designs
+import hashlib
+import json
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BillOfMaterials, CustomDesign, DesignMaterial, FootwearProduct, ProductionOrder
+from .order_entry import production_costs
+
+def design_fingerprint(product_id, materials, custom_colors):
+    """
+    sha256 of everything that decides how a design is built, except its size.
+
+    materials is a list of (component, material id); components and colors
+    are compared case-insensitively so '#FF0000' and '#ff0000' match.
+    """
+    canonical = {
+        'product': product_id,
+        'materials': sorted([component.strip().lower(), material_id] for component, material_id in materials),
+        'colors': {
+            str(part).strip().lower(): str(color).strip().lower()
+            for part, color in (custom_colors or {}).items()
+        },
+    }
+    content = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def update_fingerprints(design_ids):
+    """Recompute and store the fingerprints of the given designs with two reads and one update"""
+    materials = defaultdict(list)
+    for design_id, component, material_id in DesignMaterial.objects.filter(
+        design_id__in=design_ids
+    ).values_list('design_id', 'component', 'material_id'):
+        materials[design_id].append((component, material_id))
+    designs = [
+        CustomDesign(pk=pk, fingerprint=design_fingerprint(product_id, materials[pk], colors))
+        for pk, product_id, colors in CustomDesign.objects.filter(pk__in=design_ids).values_list(
+            'pk', 'base_product_id', 'custom_colors'
+        )
+    ]
+    # bulk_update sends no post_save, so this cannot re-trigger itself
+    CustomDesign.objects.bulk_update(designs, ['fingerprint'], batch_size=1000)
+    return len(designs)
+
+def unbatched_designs():
+    """Approved designs that are on no production order yet"""
+    return CustomDesign.objects.filter(
+        approved=True, production_order__isnull=True, productionorder__isnull=True
+    )
+
+def run_design_batching(created_by, min_designs=1):
+    """
+    Combine approved, identical designs into one production order each.
+
+    Designs are grouped by fingerprint across customers, so identical
+    designs share one production run; every design is one pair, counted
+    in the order's size_breakdown under its size. Groups smaller than
+    min_designs wait for a later run. Invoicing bills each design's
+    customer for its own pairs through batched_designs. The order keeps
+    custom_design when all of its designs belong to one customer.
+    Returns (orders created, designs batched).
+    """
+    missing = list(unbatched_designs().filter(fingerprint='').values_list('pk', flat=True))
+    if missing:
+        update_fingerprints(missing)
+
+    with transaction.atomic():
+        # Designs locked by a concurrent run are left for that run
+        designs = list(
+            unbatched_designs().select_for_update(skip_locked=True, of=('self',)).order_by('pk').values_list(
+                'pk', 'fingerprint', 'base_product_id', 'customer_id',
+                'size__size_chart__region', 'size__size_value',
+            )
+        )
+        groups = defaultdict(list)
+        for design in designs:
+            groups[design[1]].append(design)
+        groups = [group for group in groups.values() if len(group) >= min_designs]
+        if not groups:
+            return 0, 0
+
+        product_ids = {group[0][2] for group in groups}
+        products = dict(FootwearProduct.objects.filter(pk__in=product_ids).values_list('pk', 'production_time_days'))
+        bom = defaultdict(list)
+        for product_id, required, cost_per_unit in BillOfMaterials.objects.filter(
+            product_id__in=product_ids
+        ).values_list('product_id', 'quantity_required', 'material__cost_per_unit'):
+            bom[product_id].append((required, cost_per_unit))
+
+        today = timezone.now().date()
+        batch = uuid.uuid4().hex[:6].upper()
+        orders = []
+        for position, group in enumerate(groups, start=1):
+            representative, fingerprint, product_id = group[0][:3]
+            customers = {design[3] for design in group}
+            breakdown = defaultdict(int)
+            for design in group:
+                breakdown[f'{design[4]}{design[5]}'] += 1
+            material, labor, overhead = production_costs(bom[product_id], len(group))
+            orders.append(ProductionOrder(
+                order_number=f"PO{today.strftime('%Y%m%d')}-{batch}-{position:04d}",
+                product_id=product_id,
+                custom_design_id=representative if len(customers) == 1 else None,
+                quantity=len(group),
+                size_breakdown=dict(breakdown),
+                expected_completion=today + timedelta(days=products[product_id]),
+                material_cost=material,
+                labor_cost=labor,
+                overhead_cost=overhead,
+                total_cost=material + labor + overhead,
+                created_by=created_by,
+                notes=f'Batch of {len(group)} identical designs ({fingerprint[:12]})',
+            ))
+        ProductionOrder.objects.bulk_create(orders, batch_size=500)
+
+        linked = [
+            CustomDesign(pk=design[0], production_order=order)
+            for order, group in zip(orders, groups)
+            for design in group
+        ]
+        CustomDesign.objects.bulk_update(linked, ['production_order'], batch_size=1000)
+    return len(orders), len(linked)
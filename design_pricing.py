@@ -0,0 +1,118 @@
+# Custom design pricing from material selections
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from .design_batching import update_fingerprints
+from .models import BillOfMaterials, DesignMaterial, FootwearProduct
+
+CENT = Decimal('0.01')
+
+_matrix_cache = {}
+
+def clear_design_price_cache(product_ids=None):
+    """Drop cached option matrices (all of them when product_ids is None)"""
+    if product_ids is None:
+        _matrix_cache.clear()
+        return
+    for product_id in product_ids:
+        _matrix_cache.pop(product_id, None)
+
+def component_key(name):
+    return name.strip().lower()
+
+def _build_matrix(product_id):
+    """Option matrix of one product, read with three queries"""
+    base_price = FootwearProduct.objects.values_list('base_price', flat=True).get(pk=product_id)
+    available = dict(
+        FootwearProduct.available_materials.through.objects.filter(
+            footwearproduct_id=product_id
+        ).values_list('material_id', 'material__cost_per_unit')
+    )
+    # A component may list several materials; the customer's choice replaces
+    # the one it uses most of
+    defaults = {}
+    bom = BillOfMaterials.objects.filter(product_id=product_id).order_by('quantity_required').values_list(
+        'component_name', 'material_id', 'material__cost_per_unit', 'quantity_required'
+    )
+    for name, material_id, cost_per_unit, quantity in bom:
+        defaults[component_key(name)] = (name, material_id, cost_per_unit, quantity)
+
+    markup = Decimal(str(settings.FOOTWEAR_SETTINGS['DESIGN_MATERIAL_MARKUP']))
+    components = {}
+    for key, (name, default_id, default_cost, quantity) in defaults.items():
+        options = {default_id: Decimal('0.00')}
+        for material_id, cost_per_unit in available.items():
+            # Cheaper materials do not lower the price below the base product
+            surcharge = max((cost_per_unit - default_cost) * quantity * markup, Decimal('0'))
+            options[material_id] = surcharge.quantize(CENT, rounding=ROUND_HALF_UP)
+        components[key] = {
+            'name': name,
+            'quantity': quantity,
+            'default_material': default_id,
+            'options': options,
+        }
+    return {
+        'product_id': product_id,
+        'base_price': base_price,
+        'customization_fee': Decimal(str(settings.FOOTWEAR_SETTINGS['DESIGN_CUSTOMIZATION_FEE'])),
+        'components': components,
+    }
+
+def option_matrix(product_id):
+    """
+    {component: material surcharges} for a product, cached per process.
+
+    Signals drop a product's matrix when its BOM, materials or price
+    change; other worker processes reload after DESIGN_PRICE_CACHE_SECONDS.
+    """
+    ttl = settings.FOOTWEAR_SETTINGS.get('DESIGN_PRICE_CACHE_SECONDS', 300)
+    cached = _matrix_cache.get(product_id)
+    if cached is None or time.monotonic() - cached[0] > ttl:
+        cached = (time.monotonic(), _build_matrix(product_id))
+        _matrix_cache[product_id] = cached
+    return cached[1]
+
+def price_design(product_id, selections):
+    """
+    Price a design from {component: material id} selections, in memory.
+
+    Components left out keep their BOM material. Raises ValidationError
+    keyed by component for unknown components or materials that are not
+    available for the product.
+    """
+    matrix = option_matrix(product_id)
+    components = matrix['components']
+    errors = {}
+    lines = []
+    for component, material_id in selections.items():
+        key = component_key(component)
+        if key not in components:
+            errors[component] = 'Not a component of this product'
+            continue
+        surcharge = components[key]['options'].get(material_id)
+        if surcharge is None:
+            errors[component] = 'Material is not available for this product'
+            continue
+        lines.append({'component': key, 'material_id': material_id, 'surcharge': surcharge})
+    if errors:
+        raise ValidationError(errors)
+
+    customization_fee = matrix['customization_fee'] + sum((line['surcharge'] for line in lines), Decimal('0.00'))
+    return {
+        'base_price': matrix['base_price'],
+        'customization_fee': customization_fee,
+        'total_price': matrix['base_price'] + customization_fee,
+        'components': lines,
+    }
+
+def save_design_materials(design, components):
+    """Store priced component choices as DesignMaterial rows in one insert"""
+    DesignMaterial.objects.bulk_create([
+        DesignMaterial(design=design, material_id=line['material_id'], component=line['component'])
+        for line in components
+    ])
+    # bulk_create skips the DesignMaterial signals
+    update_fingerprints([design.pk])
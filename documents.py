@@ -0,0 +1,99 @@
+# Rendered invoice document store with background pre-rendering
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from accounting.models import Invoice
+from .models import InvoiceDocument
+
+logger = logging.getLogger(__name__)
+
+INVOICE_DOCUMENT_TEMPLATE = 'web/invoice_document.html'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='invoice-render')
+
+def bump_document_version(invoice_id):
+    """Invalidate the stored document of an invoice after its content changed"""
+    # Invoices that were never rendered have no row; they render on first view
+    InvoiceDocument.objects.filter(invoice_id=invoice_id).update(
+        content_version=F('content_version') + 1
+    )
+
+def refresh_invoice_documents(invoice_ids, render=True):
+    """
+    Bulk counterpart of the Invoice post_save handler, for writes that skip
+    signals (bulk_create, bulk_update); call inside the writing transaction.
+    """
+    invoice_ids = list(invoice_ids)
+    InvoiceDocument.objects.filter(invoice_id__in=invoice_ids).update(
+        content_version=F('content_version') + 1
+    )
+    if render:
+        for invoice_id in invoice_ids:
+            schedule_render(invoice_id)
+
+def render_invoice_document(invoice_id):
+    """
+    Render an invoice and store the result against the version it was read at.
+
+    If the invoice changes while rendering, the version check on the final
+    UPDATE leaves the store untouched so a stale document is never marked
+    current.
+    """
+    document, _ = InvoiceDocument.objects.get_or_create(invoice_id=invoice_id)
+    version = document.content_version
+    invoice = Invoice.objects.select_related('wholesale_customer').prefetch_related(
+        'items__product', 'payments'
+    ).get(pk=invoice_id)
+    html = render_to_string(INVOICE_DOCUMENT_TEMPLATE, {
+        'invoice': invoice,
+        'company': settings.FOOTWEAR_SETTINGS,
+    })
+    InvoiceDocument.objects.filter(pk=document.pk, content_version=version).update(
+        html=html, rendered_version=version, rendered_at=timezone.now()
+    )
+    return html
+
+def stale_invoice_ids():
+    """Finalized invoices whose stored document is missing or out of date"""
+    return Invoice.objects.exclude(status='draft').exclude(
+        document__rendered_version=F('document__content_version')
+    ).values_list('pk', flat=True)
+
+def get_invoice_document(invoice_id, customer=None):
+    """
+    Stored HTML of an invoice, rendering it first if it is missing or stale.
+
+    The common case is a single query. Returns None when the invoice does
+    not exist or does not belong to the given customer.
+    """
+    documents = InvoiceDocument.objects.filter(invoice_id=invoice_id)
+    invoices = Invoice.objects.filter(pk=invoice_id)
+    if customer is not None:
+        documents = documents.filter(invoice__customer=customer)
+        invoices = invoices.filter(customer=customer)
+
+    stored = documents.values_list('html', 'rendered_version', 'content_version').first()
+    if stored and stored[1] == stored[2]:
+        return stored[0]
+    if stored is None and not invoices.exists():
+        return None
+    return render_invoice_document(invoice_id)
+
+def _render_in_background(invoice_id):
+    try:
+        render_invoice_document(invoice_id)
+    except Exception:
+        logger.exception('Pre-rendering invoice %s failed', invoice_id)
+    finally:
+        # Worker threads get their own connection; don't leave it open
+        connection.close()
+
+def schedule_render(invoice_id):
+    """Pre-render an invoice on a worker thread once the current transaction commits"""
+    transaction.on_commit(lambda: _executor.submit(_render_in_background, invoice_id))
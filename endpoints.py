@@ -0,0 +1,90 @@
+# Token-authenticated API endpoints for ERP and partner integrations
+from django.urls import path
+from rest_framework import permissions, status, viewsets
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.routers import SimpleRouter
+from rest_framework.views import APIView
+
+from products.catalog_sync import catalog_changes
+from products.models import FootwearProduct, Material, SizeChart, WholesaleCustomer
+from .bulk_invoices import bulk_create_invoices
+from .fast_lists import FastJSONRenderer, FastListMixin
+from .prefetch import PlannedQuerysetMixin
+from .serializers import FootwearProductSerializer, MaterialSerializer, SizeChartSerializer
+
+# Byte-for-byte the same output as JSONRenderer, see tests.FastListTests
+FAST_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
+
+class BulkInvoiceCreateView(APIView):
+    """
+    POST a list of invoices (or {"invoices": [...]}) to create them in bulk.
+
+    Uses the configured authentication classes, so ERP clients can call it
+    with a token; staff only. Errors are reported per row by index.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        payload = request.data
+        if isinstance(payload, dict):
+            payload = payload.get('invoices')
+        if not isinstance(payload, list):
+            return Response({'success': False, 'error': 'Expected a list of invoices'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, errors = bulk_create_invoices(payload, created_by=request.user)
+        return Response({'success': not errors, 'created': created, 'errors': errors})
+
+class CatalogChangesView(APIView):
+    """
+    Catalog rows changed since a cursor, for partners mirroring the catalog.
+
+    Partners only see their own tier's prices; staff get every tier.
+    """
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 500))
+        except ValueError:
+            return Response({'success': False, 'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tier = None
+        if not request.user.is_staff:
+            customer = WholesaleCustomer.objects.filter(user=request.user, approved=True).first()
+            tier = customer.discount_tier if customer else ''
+
+        try:
+            changes = catalog_changes(request.query_params.get('cursor'), limit=limit, discount_tier=tier)
+        except ValueError:
+            return Response({'success': False, 'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': True, **changes})
+
+class CatalogProductViewSet(FastListMixin, PlannedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Active products. Flat lists are served from values_list(); ?expand=
+    relations are loaded with a fixed number of queries per page.
+    """
+    queryset = FootwearProduct.objects.filter(active=True).order_by('pk')
+    serializer_class = FootwearProductSerializer
+    renderer_classes = FAST_RENDERERS
+
+class CatalogMaterialViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Material.objects.order_by('pk')
+    serializer_class = MaterialSerializer
+    renderer_classes = FAST_RENDERERS
+
+class CatalogSizeChartViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = SizeChart.objects.order_by('pk')
+    serializer_class = SizeChartSerializer
+    renderer_classes = FAST_RENDERERS
+
+router = SimpleRouter()
+router.register('catalog/products', CatalogProductViewSet, basename='catalog-product')
+router.register('catalog/materials', CatalogMaterialViewSet, basename='catalog-material')
+router.register('catalog/size-charts', CatalogSizeChartViewSet, basename='catalog-size-chart')
+
+# Included by the api URLconf
+urlpatterns = router.urls + [
+    path('catalog/changes/', CatalogChangesView.as_view(), name='catalog_changes'),
+    path('invoices/bulk/', BulkInvoiceCreateView.as_view(), name='bulk_invoice_create'),
+]
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from products.db_routers import read_from_replica
+from products.exports import EXPORTS, export_rows
+from products.streaming import STREAM_FORMATS, write_stream
+
+class Command(BaseCommand):
+    help = 'Export products (with BOM), production orders or invoices (with items and payments) as NDJSON or CSV'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(STREAM_FORMATS), default='ndjson')
+        parser.add_argument('--status', help='Only orders or invoices with this status')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read per query')
+        parser.add_argument('--output', help='File to write to, defaults to stdout')
+    
+    def handle(self, *args, **options):
+        with read_from_replica():
+            fieldnames, rows = export_rows(options['name'], chunk_size=options['chunk_size'], status=options['status'])
+            if options['output']:
+                with open(options['output'], 'w', newline='') as stream:
+                    write_stream(stream, options['format'], fieldnames, rows)
+            else:
+                write_stream(self.stdout, options['format'], fieldnames, rows)
@@ -0,0 +1,98 @@
+# Streaming exports of products, production orders and invoices
+from collections import defaultdict
+
+from accounting.models import Invoice, InvoiceItem, Payment
+from .models import BillOfMaterials, FootwearProduct, ProductionOrder
+
+PRODUCT_FIELDS = [
+    'id', 'sku', 'name', 'category_id', 'category__name', 'gender', 'base_price',
+    'production_time_days', 'minimum_order_quantity', 'customizable', 'active',
+    'created_at', 'updated_at',
+]
+ORDER_FIELDS = [
+    'id', 'order_number', 'product_id', 'product__sku', 'custom_design_id', 'quantity',
+    'size_breakdown', 'status', 'start_date', 'expected_completion', 'actual_completion',
+    'material_cost', 'labor_cost', 'overhead_cost', 'total_cost', 'invoice_id',
+    'created_by_id', 'created_at',
+]
+INVOICE_FIELDS = [
+    'id', 'invoice_number', 'customer_id', 'wholesale_customer_id', 'invoice_date',
+    'due_date', 'paid_date', 'status', 'subtotal', 'tax_rate', 'tax_amount',
+    'total_amount', 'billing_name',
+]
+
+def _chunks(queryset, fields, chunk_size):
+    """
+    Lists of row dicts in pk order, one keyset query per chunk.
+
+    Each chunk is a short query of its own, so a long download holds no
+    cursor or transaction open between chunks.
+    """
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk').values(*fields)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]['id']
+
+def _children(queryset, parent_field, parent_ids, fields):
+    """{parent id: [child rows]} for a whole chunk of parents with one query"""
+    grouped = defaultdict(list)
+    rows = queryset.filter(**{f'{parent_field}__in': parent_ids}).order_by(parent_field, 'pk').values(parent_field, *fields)
+    for row in rows:
+        grouped[row.pop(parent_field)].append(row)
+    return grouped
+
+def iter_products(chunk_size=2000):
+    """Products with their bill of materials"""
+    for chunk in _chunks(FootwearProduct.objects.all(), PRODUCT_FIELDS, chunk_size):
+        bom = _children(
+            BillOfMaterials.objects.all(), 'product_id', [row['id'] for row in chunk],
+            ['component_name', 'material_id', 'material__name', 'quantity_required', 'material__cost_per_unit'],
+        )
+        for row in chunk:
+            row['bom'] = bom[row['id']]
+            yield row
+
+def iter_orders(chunk_size=2000, status=None):
+    """Production orders with their size breakdown"""
+    orders = ProductionOrder.objects.all()
+    if status:
+        orders = orders.filter(status=status)
+    for chunk in _chunks(orders, ORDER_FIELDS, chunk_size):
+        yield from chunk
+
+def iter_invoices(chunk_size=2000, status=None):
+    """Invoices with their items and payments"""
+    invoices = Invoice.objects.all()
+    if status:
+        invoices = invoices.filter(status=status)
+    for chunk in _chunks(invoices, INVOICE_FIELDS, chunk_size):
+        invoice_ids = [row['id'] for row in chunk]
+        items = _children(
+            InvoiceItem.objects.all(), 'invoice_id', invoice_ids,
+            ['product_id', 'description', 'quantity', 'unit_price', 'total_price'],
+        )
+        payments = _children(
+            Payment.objects.all(), 'invoice_id', invoice_ids,
+            ['amount', 'payment_date', 'payment_method', 'reference_number', 'status'],
+        )
+        for row in chunk:
+            row['items'] = items[row['id']]
+            row['payments'] = payments[row['id']]
+            yield row
+
+# {name: (fieldnames, row iterator, accepts a status filter)}
+EXPORTS = {
+    'products': (PRODUCT_FIELDS + ['bom'], iter_products, False),
+    'orders': (ORDER_FIELDS, iter_orders, True),
+    'invoices': (INVOICE_FIELDS + ['items', 'payments'], iter_invoices, True),
+}
+
+def export_rows(name, chunk_size=2000, status=None):
+    """(fieldnames, rows) of an export; raises KeyError for unknown names"""
+    fieldnames, iterator, filters_status = EXPORTS[name]
+    if filters_status:
+        return fieldnames, iterator(chunk_size=chunk_size, status=status)
+    return fieldnames, iterator(chunk_size=chunk_size)
@@ -0,0 +1,181 @@
+# Read-only fast path for list endpoints: values_list() rows instead of model instances
+import re
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from products.instrumentation import timed
+from .serializers import DynamicFieldsMixin
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# A float orjson wrote in exponent form ('1e20' where json writes '1e+20')
+EXPONENT_FLOAT = re.compile(rb'[:,\[]-?\d+(?:\.\d+)?e-?\d+[,}\]]')
+
+# to_representation implementations that render field by field
+ROW_RENDERERS = {serializers.Serializer.to_representation, DynamicFieldsMixin.to_representation}
+
+# Fields whose to_representation returns database values unchanged
+PASSTHROUGH = {
+    serializers.BooleanField.to_representation,
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.ReadOnlyField.to_representation,
+}
+
+class FastListPlan:
+    """Columns to fetch and how to render them, derived from a serializer's fields"""
+
+    def __init__(self, model, columns, many):
+        self.model = model
+        self.columns = columns  # [(name, attname, to_representation or None)]
+        self.many = many  # [(name, lookup, ordering, to_representation or None)]
+        self.attnames = [attname for name, attname, render in columns]
+        pk = model._meta.pk.attname
+        if pk not in self.attnames:
+            # Fetched to look up the id lists, but not part of the output
+            self.attnames.append(pk)
+        self.pk_index = self.attnames.index(pk)
+
+    def rows(self, queryset):
+        """The queryset as tuples of the planned columns"""
+        return queryset.prefetch_related(None).values_list(*self.attnames)
+
+    def build(self, rows):
+        """Representations of rows, equal to what the serializer would return"""
+        rows = list(rows)
+        columns = list(enumerate(self.columns))
+        data = [
+            {
+                name: value if render is None or value is None else render(value)
+                for name, render, value in ((name, render, row[index]) for index, (name, attname, render) in columns)
+            }
+            for row in rows
+        ]
+        if self.many and data:
+            ids = [row[self.pk_index] for row in rows]
+            for name, lookup, ordering, render in self.many:
+                related = defaultdict(list)
+                pairs = self.model._default_manager.filter(pk__in=ids, **{f'{lookup}__isnull': False})
+                for pk, related_pk in pairs.order_by(*ordering).values_list('pk', lookup):
+                    related[pk].append(related_pk if render is None else render(related_pk))
+                for pk, item in zip(ids, data):
+                    item[name] = related[pk]
+        return data
+
+def _ordering(lookup, related_model):
+    """Order related ids the way related_manager.all() does"""
+    ordering = related_model._meta.ordering or ['pk']
+    return [
+        f'-{lookup}__{field[1:]}' if field.startswith('-') else f'{lookup}__{field}'
+        for field in ordering
+        if isinstance(field, str)
+    ]
+
+def fast_plan(serializer):
+    """
+    A FastListPlan for serializer, or None when it cannot be used.
+
+    Only flat serializers qualify: every field must be a model column, a
+    primary-key relation or a list of primary keys, and the serializer must
+    not override to_representation. Expanded relations and computed
+    fields fall back to the regular serializer.
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if type(serializer).to_representation not in ROW_RENDERERS:
+        return None
+    model = serializer.Meta.model
+
+    columns = []
+    many = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.BaseSerializer) or len(field.source_attrs) != 1:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, ManyRelatedField):
+            child = field.child_relation
+            if type(child) is not PrimaryKeyRelatedField:
+                return None
+            render = child.pk_field.to_representation if child.pk_field else None
+            many.append((name, field.source, _ordering(field.source, model_field.related_model), render))
+        elif isinstance(field, PrimaryKeyRelatedField):
+            if not model_field.concrete:
+                return None
+            render = field.pk_field.to_representation if field.pk_field else None
+            columns.append((name, model_field.attname, render))
+        elif isinstance(field, serializers.RelatedField) or model_field.is_relation or not model_field.concrete:
+            return None
+        else:
+            render = field.to_representation
+            if type(field).to_representation in PASSTHROUGH:
+                render = None
+            columns.append((name, model_field.attname, render))
+
+    return FastListPlan(model, columns, many)
+
+class FastListMixin:
+    """
+    ListModelMixin replacement that serves list requests from values_list().
+
+    No model instances or per-row serializers are created; the response
+    data is the same as the serializer's. Viewsets whose serializer (as
+    built for this request's ?fields=/?expand=) does not qualify use the
+    normal list().
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = fast_plan(self.get_serializer(many=True))
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = plan.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        with timed('serializer'):
+            data = plan.build(page if page is not None else rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    Decimal, date and datetime values go through DRF's encoder, so the
+    bytes match JSONRenderer with the default COMPACT_JSON and
+    UNICODE_JSON settings. orjson spells float exponents differently, so
+    output that may hold one is rendered again by JSONRenderer, as is
+    anything else orjson cannot encode.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON):
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if EXPONENT_FLOAT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these for JavaScript; do the same
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
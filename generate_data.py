@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from products.synthetic import already_generated, generate
+
+class Command(BaseCommand):
+    help = 'Generate a seeded, referentially consistent synthetic dataset for load testing and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed and sizes recreate the same dataset')
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--materials', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=100)
+        parser.add_argument('--designs', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=10000, help='Production orders')
+        parser.add_argument('--invoices', type=int, default=2000)
+        parser.add_argument('--as-of', help='Date (YYYY-MM-DD) the history ends on, defaults to today; fix it for identical datasets')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--created-by', help='Username recorded on the invoices, defaults to the first superuser')
+
+    def handle(self, *args, **options):
+        for name in ('products', 'materials', 'customers'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1')
+        for name in ('designs', 'orders', 'invoices'):
+            if options[name] < 0:
+                raise CommandError(f'--{name} cannot be negative')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        as_of = None
+        if options['as_of']:
+            try:
+                as_of = parse_date(options['as_of'])
+            except ValueError:
+                as_of = None
+            if as_of is None:
+                raise CommandError(f"Invalid --as-of: {options['as_of']}")
+
+        if options['created_by']:
+            created_by = User.objects.filter(username=options['created_by']).first()
+        else:
+            created_by = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if created_by is None:
+            raise CommandError('No user found to record as invoice creator')
+
+        if already_generated():
+            raise CommandError('Synthetic data already exists; run "manage.py flush" or use a fresh database first')
+
+        generate(
+            created_by,
+            products=options['products'],
+            materials=options['materials'],
+            customers=options['customers'],
+            designs=options['designs'],
+            orders=options['orders'],
+            invoices=options['invoices'],
+            seed=options['seed'],
+            as_of=as_of,
+            batch_size=options['batch_size'],
+            log=lambda message: self.stdout.write(f'  {message}'),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Generated synthetic data with seed {options['seed']}"))
@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from products.catalog_import import IMPORT_FORMATS, import_catalog, read_records
+
+class Command(BaseCommand):
+    help = 'Import or update products, their sizes, materials and BOM from a CSV, NDJSON or JSON catalog'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Products per transaction')
+        parser.add_argument('--report', help='Write the per-product diff report to this file as NDJSON')
+    
+    def handle(self, *args, **options):
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in IMPORT_FORMATS:
+            raise CommandError(f'Cannot tell the format of {options["path"]}; pass --format')
+        
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as stream:
+                report = import_catalog(
+                    read_records(stream, fmt),
+                    dry_run=options['dry_run'],
+                    chunk_size=options['chunk_size'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        
+        counts = {action: 0 for action in ('create', 'update', 'unchanged', 'error')}
+        for entry in report:
+            counts[entry['action']] += 1
+            if entry['action'] == 'update':
+                self.stdout.write(f"~ {entry['sku']}: {', '.join(entry['changes'])}")
+            elif entry['action'] == 'create':
+                self.stdout.write(f"+ {entry['sku']}")
+            elif entry['action'] == 'error':
+                self.stdout.write(self.style.WARNING(f"! line {entry['line']} {entry['sku']}: {entry['error']}"))
+        
+        if options['report']:
+            with open(options['report'], 'w') as stream:
+                for entry in report:
+                    stream.write(json.dumps(entry) + '\n')
+        
+        summary = (
+            f"{counts['create']} to create, {counts['update']} to update, "
+            f"{counts['unchanged']} unchanged, {counts['error']} errors"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing written: {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary.replace('to create', 'created').replace('to update', 'updated')))
@@ -0,0 +1,244 @@
+# Sampled per-request SQL, view, template and serializer timing
+import contextvars
+import heapq
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger('footwear.requests')
+
+_current = contextvars.ContextVar('request_timer', default=None)
+
+MAX_SQL_LENGTH = 500
+
+def _setting(name, default):
+    return settings.FOOTWEAR_SETTINGS.get(name, default)
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+class RequestTimer:
+    """
+    Timings of one request; also the execute_wrapper that records its queries.
+
+    Statements are compared by their SQL text with the parameters left
+    out, so the same query run for many rows counts as duplicates.
+    """
+
+    def __init__(self, keep_slowest=5):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_name = None
+        self.sections = Counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.keep_slowest = keep_slowest
+        self.slowest = []  # min-heap of (seconds, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            self.statements[sql] += 1
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, (duration, sql))
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (duration, sql))
+
+    def duplicates(self, threshold):
+        """[(sql, count)] of statements run at least threshold times, most repeated first"""
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+    def record(self, request, response, total, duplicate_threshold):
+        duplicates = self.duplicates(duplicate_threshold)
+        return {
+            'request_id': getattr(request, 'request_id', None),
+            'method': request.method,
+            'path': request.path,
+            'view': self.view_name,
+            'status': response.status_code,
+            'streaming': response.streaming,
+            'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+            'sampled': True,
+            'duration_ms': _ms(total),
+            'view_ms': _ms(time.perf_counter() - self.view_started) if self.view_started else None,
+            'sql_ms': _ms(self.sql_time),
+            'queries': self.queries,
+            'template_ms': _ms(self.sections['template']),
+            'serializer_ms': _ms(self.sections['serializer']),
+            'duplicates': [{'sql': sql[:MAX_SQL_LENGTH], 'count': count} for sql, count in duplicates[:5]],
+            'slowest': [
+                {'sql': sql[:MAX_SQL_LENGTH], 'ms': _ms(duration)}
+                for duration, sql in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def server_timing(self, record):
+        """Server-Timing header value for a record"""
+        metrics = [
+            f"total;dur={record['duration_ms']}",
+            f"sql;dur={record['sql_ms']};desc=\"{record['queries']} queries\"",
+        ]
+        if record['view_ms'] is not None:
+            metrics.append(f"view;dur={record['view_ms']}")
+        for section in ('template', 'serializer'):
+            if self.sections[section]:
+                metrics.append(f"{section};dur={record[f'{section}_ms']}")
+        if record['duplicates']:
+            metrics.append(f"dup;desc=\"{sum(item['count'] for item in record['duplicates'])} repeated queries\"")
+        return ', '.join(metrics)
+
+@contextmanager
+def timed(section):
+    """Add the time spent in the block to section of the current request, if it is instrumented"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.sections[section] += time.perf_counter() - started
+
+@contextmanager
+def _instrumented(timer):
+    """Record the block's queries and timed sections on timer"""
+    token = _current.set(timer)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            yield
+    finally:
+        _current.reset(token)
+
+_DONE = object()
+
+def instrumented_stream(content, timer, finished):
+    """
+    Iterate streaming content with its queries recorded on timer, and call
+    finished() once the stream is exhausted or closed. Streaming views run
+    their queries while the response is consumed, after the view returns.
+    """
+    iterator = iter(content)
+    try:
+        while True:
+            with _instrumented(timer):
+                chunk = next(iterator, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        finished()
+
+def closing_stream(content, finished):
+    """Iterate streaming content and call finished() once it is exhausted or closed"""
+    try:
+        yield from content
+    finally:
+        finished()
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_staff)
+
+class RequestTimingMiddleware:
+    """
+    Query count, SQL time, slowest statements, repeated statements (N+1)
+    and view, template and serializer time for a sample of requests.
+
+    Sampled requests are logged to the footwear.requests logger with the
+    timings as the record's data; requests with repeated statements or
+    over the slow threshold are logged as warnings. Unsampled requests
+    only have their total time measured and are logged when slow. Staff
+    requests are always sampled and get a Server-Timing header. Streaming
+    responses are measured until the stream closes and logged then; they
+    get no Server-Timing header, which is sent before the body. Goes
+    after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = float(_setting('REQUEST_TIMING_SAMPLE_RATE', 0.01))
+        self.slow_ms = float(_setting('REQUEST_TIMING_SLOW_MS', 1000))
+        self.duplicate_threshold = int(_setting('REQUEST_TIMING_DUPLICATE_THRESHOLD', 5))
+        self.keep_slowest = int(_setting('REQUEST_TIMING_SLOWEST', 5))
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        staff = _is_staff(request)
+        if not staff and random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            finished = lambda: self.log_unsampled(request, response, time.perf_counter() - started)
+            if response.streaming:
+                response.streaming_content = closing_stream(response.streaming_content, finished)
+            else:
+                finished()
+            return response
+
+        timer = RequestTimer(self.keep_slowest)
+        with _instrumented(timer):
+            response = self.get_response(request)
+
+        finished = lambda: self.log_sampled(timer, request, response, time.perf_counter() - started)
+        if response.streaming:
+            response.streaming_content = instrumented_stream(response.streaming_content, timer, finished)
+            return response
+        record = finished()
+        if staff:
+            response['Server-Timing'] = timer.server_timing(record)
+        return response
+
+    def log_unsampled(self, request, response, total):
+        if total * 1000 >= self.slow_ms:
+            logger.warning('slow request', extra={'data': {
+                'request_id': getattr(request, 'request_id', None),
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'streaming': response.streaming,
+                'sampled': False,
+                'duration_ms': _ms(total),
+            }})
+
+    def log_sampled(self, timer, request, response, total):
+        record = timer.record(request, response, total, self.duplicate_threshold)
+        level = logging.WARNING if record['duplicates'] or record['duration_ms'] >= self.slow_ms else logging.INFO
+        logger.log(level, 'request timing', extra={'data': record})
+        return record
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = _current.get()
+        if timer is not None:
+            timer.view_started = time.perf_counter()
+            timer.view_name = f'{view_func.__module__}.{getattr(view_func, "__name__", type(view_func).__name__)}'
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates whose templates report their render time to the request timer"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,178 @@
+# Month-end batch invoicing from completed production orders
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounting.models import Invoice, InvoiceItem
+from .credit import apply_balance_changes, invoice_balances, mark_holds_invoiced
+from .documents import refresh_invoice_documents
+from .models import CustomDesign, ProductionOrder, WholesaleCustomer
+from .pricing import tier_unit_price
+from .tax import calculate_tax, rate_for
+
+def uninvoiced_orders():
+    """
+    Completed orders not yet on an invoice, annotated with the user being billed.
+
+    Batched orders are left out: their designs are billed one customer at
+    a time, see uninvoiced_designs().
+    """
+    return ProductionOrder.objects.filter(status='completed', invoice__isnull=True).exclude(
+        Exists(CustomDesign.objects.filter(production_order=OuterRef('pk')))
+    ).annotate(
+        billed_user_id=Coalesce('custom_design__customer', 'created_by'),
+    )
+
+def uninvoiced_designs():
+    """Designs on completed batched orders that their customer has not been invoiced for"""
+    return CustomDesign.objects.filter(production_order__status='completed', invoice__isnull=True)
+
+def wholesale_unit_price(product, quantity, discount_percentage):
+    """Quantity-break price less the customer's tier discount, rounded to the cent"""
+    return tier_unit_price(product.get_price_for_quantity(quantity), Decimal('1'), discount_percentage)
+
+def _chunks(lines_by_user, chunk_size):
+    """Group customers so each transaction covers roughly chunk_size order lines"""
+    chunk, size = [], 0
+    for user_id, lines in lines_by_user.items():
+        chunk.append(user_id)
+        size += len(lines)
+        if size >= chunk_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+def run_batch_invoicing(created_by, invoice_date=None, chunk_size=500, status='sent'):
+    """
+    Invoice every completed, uninvoiced production order of wholesale customers.
+
+    Orders are grouped into one invoice per customer. An order that batches
+    designs of several customers bills each customer for its own designs,
+    one line per order and customer; the designs record their invoice.
+    Each chunk of customers is written with bulk_create in its own
+    transaction, and the orders and designs are linked to their invoice in
+    that same transaction. A failed or interrupted run can be started
+    again: nothing invoiced is ever picked up twice.
+    Returns (invoices created, order lines invoiced).
+    """
+    invoice_date = invoice_date or timezone.now().date()
+    rate = rate_for(None, invoice_date)
+    wholesale_users = WholesaleCustomer.objects.values('user_id')
+
+    # {user id: [(order id, design ids or None)]}, None for a whole order
+    lines_by_user = defaultdict(list)
+    for order_id, user_id in uninvoiced_orders().filter(
+        billed_user_id__in=wholesale_users
+    ).order_by('billed_user_id', 'pk').values_list('pk', 'billed_user_id'):
+        lines_by_user[user_id].append((order_id, None))
+    designs = defaultdict(list)
+    for design_id, user_id, order_id in uninvoiced_designs().filter(
+        customer_id__in=wholesale_users
+    ).order_by('customer_id', 'production_order_id', 'pk').values_list('pk', 'customer_id', 'production_order_id'):
+        designs[user_id, order_id].append(design_id)
+    for (user_id, order_id), design_ids in designs.items():
+        lines_by_user[user_id].append((order_id, design_ids))
+
+    invoice_count = line_count = 0
+    for user_ids in _chunks(lines_by_user, chunk_size):
+        with transaction.atomic():
+            created, billed = _invoice_chunk(user_ids, lines_by_user, created_by, invoice_date, rate, status)
+        invoice_count += created
+        line_count += billed
+    return invoice_count, line_count
+
+def _invoice_chunk(user_ids, lines_by_user, created_by, invoice_date, rate, status):
+    order_ids = [order_id for user_id in user_ids for order_id, design_ids in lines_by_user[user_id] if design_ids is None]
+    design_ids = [pk for user_id in user_ids for order_id, ids in lines_by_user[user_id] if ids for pk in ids]
+    # Rows locked by a concurrent run are skipped rather than invoiced twice
+    orders = ProductionOrder.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+        pk__in=order_ids, invoice__isnull=True
+    ).select_related('product').in_bulk()
+    designs = CustomDesign.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+        pk__in=design_ids, invoice__isnull=True
+    ).select_related('production_order__product').in_bulk()
+    customers = WholesaleCustomer.objects.in_bulk(user_ids, field_name='user_id')
+
+    invoices = []
+    lines_by_invoice = []
+    for user_id in user_ids:
+        customer = customers[user_id]
+        discount = customer.get_discount_percentage()
+        # (order, designs or None, quantity, unit price)
+        lines = []
+        for order_id, ids in lines_by_user[user_id]:
+            if ids is None:
+                if order_id in orders:
+                    order = orders[order_id]
+                    lines.append((order, None, order.quantity, wholesale_unit_price(order.product, order.quantity, discount)))
+                continue
+            # One pair per design
+            own = [designs[pk] for pk in ids if pk in designs]
+            if own:
+                order = own[0].production_order
+                lines.append((order, own, len(own), wholesale_unit_price(order.product, len(own), discount)))
+        if not lines:
+            continue
+        subtotal, tax_amount, _ = calculate_tax(
+            [unit_price * quantity for order, own, quantity, unit_price in lines], rate
+        )
+        first = lines[0]
+        reference = first[0].pk if first[1] is None else f'D{first[1][0].pk}'
+        invoice = Invoice(
+            invoice_number=f"INV{invoice_date.strftime('%Y%m%d')}-{reference}",
+            customer_id=user_id,
+            wholesale_customer=customer,
+            invoice_date=invoice_date,
+            due_date=invoice_date + timedelta(days=customer.payment_terms),
+            status=status,
+            billing_name=customer.business_name,
+            billing_address=customer.billing_address,
+            billing_email=customer.email,
+            billing_phone=customer.phone,
+            tax_id=customer.tax_id,
+            subtotal=subtotal,
+            tax_rate=rate,
+            tax_amount=tax_amount,
+            total_amount=subtotal + tax_amount,
+            created_by=created_by,
+        )
+        invoices.append(invoice)
+        lines_by_invoice.append((invoice, lines))
+
+    Invoice.objects.bulk_create(invoices)
+
+    items = []
+    billed = []
+    billed_designs = []
+    for invoice, lines in lines_by_invoice:
+        for order, own, quantity, unit_price in lines:
+            if own is None:
+                description = f"{order.product.name} ({order.order_number})"
+                order.invoice = invoice
+                billed.append(order)
+            else:
+                description = f"{order.product.name} ({order.order_number}, {quantity} of your designs)"
+                for design in own:
+                    design.invoice = invoice
+                billed_designs.extend(own)
+            items.append(InvoiceItem(
+                invoice=invoice,
+                product_id=order.product_id,
+                description=description,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=unit_price * quantity,
+            ))
+    InvoiceItem.objects.bulk_create(items, batch_size=1000)
+    ProductionOrder.objects.bulk_update(billed, ['invoice'], batch_size=1000)
+    CustomDesign.objects.bulk_update(billed_designs, ['invoice'], batch_size=1000)
+    mark_holds_invoiced([order.pk for order in billed])
+    apply_balance_changes({}, invoice_balances([invoice.pk for invoice in invoices]))
+    refresh_invoice_documents([invoice.pk for invoice in invoices], render=status != 'draft')
+    return len(invoices), len(items)
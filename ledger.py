@@ -0,0 +1,209 @@
+# Ledger posting engine with running balances and checkpoints
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Max, Sum, prefetch_related_objects
+from django.utils import timezone
+
+from accounting.models import ChartOfAccounts, JournalEntry
+from .models import AccountBalance, BalanceCheckpoint, LedgerPosting
+
+ZERO = Decimal('0.00')
+
+def _new_totals():
+    return defaultdict(lambda: [ZERO, ZERO])
+
+def _entry_totals(entry):
+    """Collapse an entry's lines into {account_id: [debit, credit]}"""
+    totals = _new_totals()
+    for line in entry.lines.all():
+        totals[line.account_id][0] += line.debit_amount or ZERO
+        totals[line.account_id][1] += line.credit_amount or ZERO
+    return totals
+
+def _validate(totals):
+    if not totals:
+        return ['Entry has no lines.']
+    debit = sum(amounts[0] for amounts in totals.values())
+    credit = sum(amounts[1] for amounts in totals.values())
+    if debit != credit:
+        return [f'Entry is not balanced (debits {debit}, credits {credit}).']
+    if debit == 0:
+        return ['Entry has no amounts.']
+    return []
+
+def unposted_entries():
+    return JournalEntry.objects.filter(ledger_postings__isnull=True).order_by('entry_date', 'pk')
+
+def post_entries(entries):
+    """
+    Validate and post a batch of journal entries in one transaction.
+
+    If any entry is invalid nothing is posted and a ValidationError keyed by
+    entry pk is raised. Returns the number of entries posted.
+    """
+    entries = list(entries)
+    prefetch_related_objects(entries, 'lines')
+
+    postings = []
+    errors = {}
+    for entry in entries:
+        totals = _entry_totals(entry)
+        problems = _validate(totals)
+        if problems:
+            errors[entry.pk] = problems
+            continue
+        for account_id, (debit, credit) in totals.items():
+            postings.append(LedgerPosting(
+                journal_entry=entry,
+                account_id=account_id,
+                entry_date=entry.entry_date,
+                debit=debit,
+                credit=credit,
+            ))
+
+    if errors:
+        raise ValidationError(errors)
+
+    with transaction.atomic():
+        LedgerPosting.objects.bulk_create(postings)
+        _apply_to_balances(postings)
+        _apply_to_checkpoints(postings)
+    return len(entries)
+
+def _apply_to_balances(postings):
+    """Add the postings to the running balance of each account, one UPDATE per account"""
+    deltas = _new_totals()
+    for posting in postings:
+        deltas[posting.account_id][0] += posting.debit
+        deltas[posting.account_id][1] += posting.credit
+
+    AccountBalance.objects.bulk_create(
+        [AccountBalance(account_id=account_id) for account_id in deltas],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for account_id, (debit, credit) in deltas.items():
+        AccountBalance.objects.filter(account_id=account_id).update(
+            debit_total=F('debit_total') + debit,
+            credit_total=F('credit_total') + credit,
+            updated_at=now,
+        )
+
+def _apply_to_checkpoints(postings):
+    """Keep checkpoints correct when back-dated entries are posted"""
+    if not postings:
+        return
+    earliest = min(posting.entry_date for posting in postings)
+    checkpoint_dates = BalanceCheckpoint.objects.filter(
+        checkpoint_date__gte=earliest
+    ).values_list('checkpoint_date', flat=True).distinct()
+
+    for checkpoint_date in checkpoint_dates:
+        deltas = _new_totals()
+        for posting in postings:
+            if posting.entry_date <= checkpoint_date:
+                deltas[posting.account_id][0] += posting.debit
+                deltas[posting.account_id][1] += posting.credit
+
+        BalanceCheckpoint.objects.bulk_create(
+            [BalanceCheckpoint(account_id=account_id, checkpoint_date=checkpoint_date) for account_id in deltas],
+            ignore_conflicts=True,
+        )
+        for account_id, (debit, credit) in deltas.items():
+            BalanceCheckpoint.objects.filter(account_id=account_id, checkpoint_date=checkpoint_date).update(
+                debit_total=F('debit_total') + debit,
+                credit_total=F('credit_total') + credit,
+            )
+
+def latest_checkpoint_date(as_of=None):
+    checkpoints = BalanceCheckpoint.objects.all()
+    if as_of is not None:
+        checkpoints = checkpoints.filter(checkpoint_date__lte=as_of)
+    return checkpoints.aggregate(latest=Max('checkpoint_date'))['latest']
+
+def account_totals(as_of=None, account_ids=None):
+    """
+    {account_id: [debit_total, credit_total]} as of the end of a date.
+
+    Without a date the running balances are returned directly. With a date
+    the nearest earlier checkpoint is combined with only the postings made
+    since, so the cost is O(accounts + entries since last checkpoint).
+    """
+    totals = _new_totals()
+
+    if as_of is None:
+        balances = AccountBalance.objects.all()
+        if account_ids is not None:
+            balances = balances.filter(account_id__in=account_ids)
+        for account_id, debit, credit in balances.values_list('account_id', 'debit_total', 'credit_total'):
+            totals[account_id] = [debit, credit]
+        return totals
+
+    postings = LedgerPosting.objects.filter(entry_date__lte=as_of)
+    checkpoint_date = latest_checkpoint_date(as_of)
+    if checkpoint_date:
+        checkpoints = BalanceCheckpoint.objects.filter(checkpoint_date=checkpoint_date)
+        if account_ids is not None:
+            checkpoints = checkpoints.filter(account_id__in=account_ids)
+        for account_id, debit, credit in checkpoints.values_list('account_id', 'debit_total', 'credit_total'):
+            totals[account_id] = [debit, credit]
+        postings = postings.filter(entry_date__gt=checkpoint_date)
+
+    if account_ids is not None:
+        postings = postings.filter(account_id__in=account_ids)
+    movements = postings.values('account_id').annotate(
+        debit_sum=Sum('debit'), credit_sum=Sum('credit')
+    ).values_list('account_id', 'debit_sum', 'credit_sum')
+    for account_id, debit, credit in movements:
+        totals[account_id][0] += debit
+        totals[account_id][1] += credit
+    return totals
+
+def account_balance(account, as_of=None):
+    """Net debit balance of a single account (negative for a credit balance)"""
+    debit, credit = account_totals(as_of, account_ids=[account.pk]).get(account.pk, (ZERO, ZERO))
+    return debit - credit
+
+def trial_balance(as_of=None):
+    """Trial balance rows for every account, optionally as of a past date"""
+    totals = account_totals(as_of)
+    rows = []
+    accounts = ChartOfAccounts.objects.order_by('account_code').values_list(
+        'pk', 'account_code', 'account_name', 'account_type'
+    )
+    for pk, code, name, account_type in accounts:
+        debit, credit = totals.get(pk, (ZERO, ZERO))
+        net = debit - credit
+        rows.append({
+            'account_code': code,
+            'account_name': name,
+            'account_type': account_type,
+            'debit': net if net > 0 else ZERO,
+            'credit': -net if net < 0 else ZERO,
+        })
+    return rows
+
+def create_checkpoint(checkpoint_date):
+    """Store cumulative totals of every account through checkpoint_date"""
+    totals = account_totals(checkpoint_date)
+    account_ids = ChartOfAccounts.objects.values_list('pk', flat=True)
+    checkpoints = [
+        BalanceCheckpoint(
+            account_id=account_id,
+            checkpoint_date=checkpoint_date,
+            debit_total=totals.get(account_id, (ZERO, ZERO))[0],
+            credit_total=totals.get(account_id, (ZERO, ZERO))[1],
+        )
+        for account_id in account_ids
+    ]
+    with transaction.atomic():
+        BalanceCheckpoint.objects.bulk_create(
+            checkpoints,
+            update_conflicts=True,
+            unique_fields=['account', 'checkpoint_date'],
+            update_fields=['debit_total', 'credit_total'],
+        )
+    return len(checkpoints)
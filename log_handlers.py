@@ -0,0 +1,73 @@
+# Queue-backed log handlers and a JSON formatter
+import json
+import logging
+import queue
+from datetime import datetime, timezone as dt_timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+from prometheus_client import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    'footwear_log_records_dropped', 'Log records dropped because the log queue was full.'
+)
+
+class BackgroundHandler(logging.Handler):
+    """
+    Hand records to a background thread that writes them with a real handler.
+
+    Configured like the handler it wraps, plus handler_class, e.g.
+    {'class': 'products.log_handlers.BackgroundHandler',
+     'handler_class': 'logging.FileHandler', 'filename': ...}.
+    Records are formatted on the calling thread with this handler's
+    formatter. When the queue is full records are dropped and counted
+    rather than blocking the request. It wraps a QueueHandler instead of
+    subclassing it, because dictConfig builds QueueHandler subclasses
+    with its own queue and listener from Python 3.12 on.
+    """
+
+    def __init__(self, handler_class, queue_size=10000, **kwargs):
+        super().__init__()
+        self.target = import_string(handler_class)(**kwargs)
+        self.queue = queue.Queue(queue_size)
+        self.queue_handler = QueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self.listening = True
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        # prepare() formats with the QueueHandler's formatter
+        self.queue_handler.setFormatter(fmt)
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(self.queue_handler.prepare(record))
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        # logging.shutdown() calls this at exit; write out what is queued first
+        if self.listening:
+            self.listening = False
+            self.listener.stop()
+        self.target.close()
+        self.queue_handler.close()
+        super().close()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; a dict passed as extra={'data': ...} is merged in"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, dt_timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'data', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
@@ -0,0 +1,78 @@
+# JSON access logs and per-view latency histograms in Prometheus format
+import logging
+import os
+import re
+import time
+import uuid
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+logger = logging.getLogger('footwear.access')
+
+# Upper bounds in seconds; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_ID_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# With PROMETHEUS_MULTIPROC_DIR set (see Procfile) every gunicorn worker
+# writes its samples to files there, and a scrape of any worker reports
+# the sum over all of them
+REQUEST_DURATION = Histogram(
+    'footwear_request_duration_seconds', 'Request latency by view.', ['view'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter('footwear_requests', 'Requests by view and status code.', ['view', 'status'])
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format, summed over every worker"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+class AccessLogMiddleware:
+    """
+    Give each request an id, log it as JSON and record its latency.
+
+    The id comes from a well-formed X-Request-ID header or is generated,
+    and is returned in X-Request-ID and kept on request.request_id. Goes
+    first in MIDDLEWARE so the duration covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+        view = _view_name(request)
+        REQUEST_DURATION.labels(view).observe(duration)
+        REQUESTS.labels(view, response.status_code).inc()
+
+        user = getattr(request, 'user', None)
+        logger.info('request', extra={'data': {
+            'request_id': request_id,
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+        }})
+        response['X-Request-ID'] = request_id
+        return response
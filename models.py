@@ -41,9 +41,11 @@ class SizeConversion(models.Model):
     size_value = models.CharField(max_length=10)  # e.g., "8.5", "42", "M"
     length_mm = models.DecimalField(max_digits=6, decimal_places=2)  # foot length in mm
     width_mm = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['size_chart', 'size_value']
+        indexes = [models.Index(fields=['updated_at', 'id'], name='size_conversion_changes')]
     
     def __str__(self):
         return f"{self.size_chart.region} {self.size_value}"
@@ -82,6 +84,10 @@ class Material(models.Model):
     unit_of_measure = models.CharField(max_length=20, default='sq_ft')  # sq_ft, meters, pieces
     minimum_order = models.IntegerField(default=1)
     lead_time_days = models.IntegerField(default=7)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='material_changes')]
     
     def __str__(self):
         return f"{self.name} ({self.color})"
@@ -122,15 +128,24 @@ class FootwearProduct(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [models.Index(fields=['updated_at', 'id'], name='product_changes')]
+    
     def __str__(self):
         return f"{self.name} ({self.sku})"
     
+    # (minimum quantity, price multiplier), largest break first
+    QUANTITY_BREAKS = [
+        (100, Decimal('0.8')),  # 20% discount
+        (50, Decimal('0.9')),  # 10% discount
+        (1, Decimal('1')),
+    ]
+    
     def get_price_for_quantity(self, quantity):
         """Calculate price based on quantity (bulk pricing)"""
-        if quantity >= 100:
-            return self.base_price * Decimal('0.8')  # 20% discount
-        elif quantity >= 50:
-            return self.base_price * Decimal('0.9')  # 10% discount
+        for min_quantity, multiplier in self.QUANTITY_BREAKS:
+            if quantity >= min_quantity:
+                return self.base_price * multiplier
         return self.base_price
 
 class BillOfMaterials(models.Model):
@@ -183,14 +198,15 @@ class WholesaleCustomer(models.Model):
     def __str__(self):
         return self.business_name
     
+    DISCOUNT_PERCENTAGES = {
+        'bronze': 5,
+        'silver': 10,
+        'gold': 15,
+        'platinum': 20,
+    }
+    
     def get_discount_percentage(self):
-        discount_map = {
-            'bronze': 5,
-            'silver': 10,
-            'gold': 15,
-            'platinum': 20,
-        }
-        return discount_map.get(self.discount_tier, 0)
+        return self.DISCOUNT_PERCENTAGES.get(self.discount_tier, 0)
 
 class CustomDesign(models.Model):
     """Customer's custom design for a footwear product"""
@@ -213,6 +229,11 @@ class CustomDesign(models.Model):
     approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Production batching
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)  # sha256 of product, materials and colors
+    production_order = models.ForeignKey('ProductionOrder', null=True, blank=True, on_delete=models.SET_NULL, related_name='batched_designs')
+    invoice = models.ForeignKey('accounting.Invoice', null=True, blank=True, on_delete=models.SET_NULL, related_name='invoiced_designs')  # billed per design when batched
+    
     def save(self, *args, **kwargs):
         if not self.total_price:
             self.total_price = self.base_price + self.customization_fee
@@ -260,6 +281,9 @@ class ProductionOrder(models.Model):
     overhead_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
+    # Billing
+    invoice = models.ForeignKey('accounting.Invoice', null=True, blank=True, on_delete=models.SET_NULL, related_name='production_orders')
+    
     # Metadata
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -275,3 +299,179 @@ class ProductionOrder(models.Model):
     
     def __str__(self):
         return f"PO {self.order_number} - {self.product.name}"
+
+
+# Ledger models
+class LedgerPosting(models.Model):
+    """Per-account amounts of a posted journal entry, the source of ledger balances"""
+    journal_entry = models.ForeignKey('accounting.JournalEntry', on_delete=models.CASCADE, related_name='ledger_postings')
+    account = models.ForeignKey('accounting.ChartOfAccounts', on_delete=models.CASCADE, related_name='ledger_postings')
+    entry_date = models.DateField()
+    debit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    posted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['journal_entry', 'account']
+        indexes = [models.Index(fields=['account', 'entry_date'], name='ledger_posting_account_date')]
+    
+    def __str__(self):
+        return f"{self.journal_entry_id} {self.account_id} Dr {self.debit} Cr {self.credit}"
+
+class AccountBalance(models.Model):
+    """Running debit/credit totals of every posting made to an account"""
+    account = models.OneToOneField('accounting.ChartOfAccounts', on_delete=models.CASCADE, related_name='ledger_balance')
+    debit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.account_id}: {self.balance}"
+    
+    @property
+    def balance(self):
+        return self.debit_total - self.credit_total
+
+class BalanceCheckpoint(models.Model):
+    """Cumulative account totals through the end of checkpoint_date"""
+    account = models.ForeignKey('accounting.ChartOfAccounts', on_delete=models.CASCADE, related_name='balance_checkpoints')
+    checkpoint_date = models.DateField(db_index=True)
+    debit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['account', 'checkpoint_date']
+    
+    def __str__(self):
+        return f"{self.account_id} @ {self.checkpoint_date}"
+
+# Inventory costing models
+class InventoryMovement(models.Model):
+    """Costed stock receipt or issue with the product's running balance after it"""
+    SOURCE_CHOICES = [
+        ('production', 'Production Order'),
+        ('invoice', 'Invoice Item'),
+    ]
+    
+    METHOD_CHOICES = [
+        ('fifo', 'FIFO'),
+        ('average', 'Weighted Average'),
+    ]
+    
+    product = models.ForeignKey(FootwearProduct, on_delete=models.CASCADE, related_name='inventory_movements')
+    source_type = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    source_id = models.PositiveBigIntegerField()
+    movement_date = models.DateField()
+    quantity = models.IntegerField()  # positive for receipts, negative for issues
+    value = models.DecimalField(max_digits=14, decimal_places=2)
+    balance_quantity = models.IntegerField()
+    balance_value = models.DecimalField(max_digits=14, decimal_places=2)
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['source_type', 'source_id']
+        indexes = [models.Index(fields=['product', 'movement_date'], name='inv_movement_product_date')]
+    
+    def __str__(self):
+        return f"{self.product.sku} {self.quantity:+d} on {self.movement_date}"
+
+class CostLayer(models.Model):
+    """FIFO cost layer created by a receipt and consumed by later issues"""
+    product = models.ForeignKey(FootwearProduct, on_delete=models.CASCADE, related_name='cost_layers')
+    receipt = models.OneToOneField(InventoryMovement, on_delete=models.CASCADE, related_name='cost_layer')
+    received_date = models.DateField()
+    quantity = models.IntegerField()
+    remaining_quantity = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=6)
+    
+    class Meta:
+        indexes = [models.Index(fields=['product', 'remaining_quantity'], name='cost_layer_product_remaining')]
+    
+    def __str__(self):
+        return f"{self.product.sku} {self.remaining_quantity}/{self.quantity} @ {self.unit_cost}"
+
+# Document models
+class InvoiceDocument(models.Model):
+    """Pre-rendered printable invoice, valid while rendered_version matches content_version"""
+    invoice = models.OneToOneField('accounting.Invoice', on_delete=models.CASCADE, related_name='document')
+    content_version = models.PositiveIntegerField(default=1)  # bumped on item, payment and status changes
+    rendered_version = models.PositiveIntegerField(default=0)
+    html = models.TextField(blank=True)
+    rendered_at = models.DateTimeField(null=True, blank=True)
+    
+    @property
+    def is_current(self):
+        return self.rendered_version == self.content_version
+    
+    def __str__(self):
+        return f"Invoice {self.invoice_id} document v{self.rendered_version}/{self.content_version}"
+
+# Credit models
+class CreditHold(models.Model):
+    """Credit reserved against a wholesale customer's limit for an order not yet invoiced"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('released', 'Released'),
+        ('invoiced', 'Invoiced'),
+    ]
+    
+    customer = models.ForeignKey(WholesaleCustomer, on_delete=models.CASCADE, related_name='credit_holds')
+    production_order = models.ForeignKey(ProductionOrder, null=True, blank=True, on_delete=models.SET_NULL, related_name='credit_holds')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['customer', 'status'], name='credit_hold_customer_status')]
+    
+    def __str__(self):
+        return f"{self.customer.business_name} hold {self.amount} ({self.status})"
+
+# Pricing models
+class PriceListEntry(models.Model):
+    """Precomputed unit price of a product for a discount tier and quantity break"""
+    product = models.ForeignKey(FootwearProduct, on_delete=models.CASCADE, related_name='price_list')
+    discount_tier = models.CharField(max_length=20, blank=True)  # blank for customers without a tier
+    min_quantity = models.IntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['product', 'discount_tier', 'min_quantity']
+        indexes = [models.Index(fields=['updated_at', 'id'], name='price_list_changes')]
+    
+    def __str__(self):
+        return f"{self.product.sku} {self.discount_tier or 'retail'} {self.min_quantity}+ @ {self.unit_price}"
+
+# Catalog sync models
+class CatalogTombstone(models.Model):
+    """Deleted catalog row, kept so sync clients can drop their copy"""
+    KIND_CHOICES = [
+        ('product', 'Product'),
+        ('material', 'Material'),
+        ('size', 'Size'),
+        ('price', 'Price'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [models.Index(fields=['deleted_at', 'id'], name='catalog_tombstone_changes')]
+    
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at}"
+
+# Reconciliation models
+class ReconciledStatementLine(models.Model):
+    """Bank statement line already posted as a payment; re-imports skip lines whose key exists"""
+    line_key = models.CharField(max_length=64, unique=True)  # sha256 of date, amount, reference, description, occurrence
+    payment = models.ForeignKey('accounting.Payment', on_delete=models.CASCADE, related_name='statement_lines')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Statement line {self.line_key[:12]} -> payment {self.payment_id}"
@@ -0,0 +1,143 @@
+# Bulk wholesale order entry from spreadsheets
+import csv
+import re
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .credit import reserve_credit_for_orders
+from .models import BillOfMaterials, FootwearProduct, ProductionOrder, SizeConversion
+from .pricing import quote_cart
+
+MAX_ORDER_LINES = 20000
+
+SIZE_RE = re.compile(r'^\s*([A-Za-z]{2})\s*-?\s*(\S+)\s*$')
+
+CENT = Decimal('0.01')
+
+def parse_size(label):
+    """'US9', 'us 9' or 'EU-42' -> ('US', '9'); None when unrecognised"""
+    match = SIZE_RE.match(label or '')
+    if not match:
+        return None
+    return match.group(1).upper(), match.group(2)
+
+def read_order_csv(stream):
+    """Yield (line number, sku, size, quantity) from a CSV stream with sku,size,quantity columns"""
+    reader = csv.DictReader(stream)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    for line_number, row in enumerate(reader, start=2):
+        yield line_number, (row.get('sku') or '').strip(), (row.get('size') or '').strip(), (row.get('quantity') or '').strip()
+
+def production_costs(bom, quantity):
+    """Material, labor and overhead costs, using the same ratios as the production order signal"""
+    material = sum((required * cost_per_unit for required, cost_per_unit in bom), Decimal('0')) * quantity
+    labor = material * Decimal('0.2')
+    overhead = (material + labor) * Decimal('0.1')
+    return material.quantize(CENT), labor.quantize(CENT), overhead.quantize(CENT)
+
+def import_order_lines(lines, customer, created_by):
+    """
+    Validate (line number, sku, size, quantity) lines and create production orders.
+
+    SKUs, sizes, per-product available sizes, BOM costs and tier prices are
+    each loaded with one query, then every line is checked in memory. Lines
+    are merged into one ProductionOrder per product with a size_breakdown.
+    Nothing is written if any line fails validation or the order total is
+    over the customer's credit limit.
+    Returns (orders, errors).
+    """
+    errors = []
+    parsed = []
+    for line_number, sku, size, quantity in lines:
+        if len(parsed) >= MAX_ORDER_LINES:
+            errors.append({'line': line_number, 'error': f'At most {MAX_ORDER_LINES} lines per import'})
+            break
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            errors.append({'line': line_number, 'error': 'Quantity must be a positive whole number'})
+            continue
+        size_key = parse_size(size)
+        if size_key is None:
+            errors.append({'line': line_number, 'error': f'Unrecognised size "{size}"'})
+            continue
+        parsed.append((line_number, sku, size_key, quantity))
+
+    skus = {sku for line_number, sku, size_key, quantity in parsed}
+    products = {
+        row[1]: row
+        for row in FootwearProduct.objects.filter(sku__in=skus, active=True).values_list(
+            'pk', 'sku', 'name', 'minimum_order_quantity', 'production_time_days'
+        )
+    }
+    sizes = defaultdict(set)
+    for size_id, region, value in SizeConversion.objects.values_list('pk', 'size_chart__region', 'size_value'):
+        sizes[(region, value)].add(size_id)
+    product_ids = [row[0] for row in products.values()]
+    available = defaultdict(set)
+    through = FootwearProduct.available_sizes.through.objects.filter(footwearproduct_id__in=product_ids)
+    for product_id, size_id in through.values_list('footwearproduct_id', 'sizeconversion_id'):
+        available[product_id].add(size_id)
+
+    breakdowns = defaultdict(lambda: defaultdict(int))
+    for line_number, sku, (region, value), quantity in parsed:
+        product = products.get(sku)
+        if product is None:
+            errors.append({'line': line_number, 'error': f'Unknown or inactive SKU "{sku}"'})
+            continue
+        if not sizes.get((region, value), set()) & available[product[0]]:
+            errors.append({'line': line_number, 'error': f'Size {region}{value} is not available for {sku}'})
+            continue
+        breakdowns[sku][f'{region}{value}'] += quantity
+
+    for sku, breakdown in breakdowns.items():
+        total = sum(breakdown.values())
+        minimum = products[sku][3]
+        if total < minimum:
+            errors.append({'sku': sku, 'error': f'Ordered {total}, minimum order quantity is {minimum}'})
+
+    if errors:
+        return [], sorted(errors, key=lambda error: error.get('line', 0))
+
+    bom = defaultdict(list)
+    for product_id, required, cost_per_unit in BillOfMaterials.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'quantity_required', 'material__cost_per_unit'):
+        bom[product_id].append((required, cost_per_unit))
+    quote = quote_cart([(sku, sum(breakdown.values())) for sku, breakdown in breakdowns.items()], customer)
+    line_totals = {line['sku']: line['line_total'] for line in quote['lines']}
+
+    today = timezone.now().date()
+    batch = uuid.uuid4().hex[:6].upper()
+    orders = []
+    for position, (sku, breakdown) in enumerate(breakdowns.items(), start=1):
+        product_id, sku, name, minimum, production_days = products[sku]
+        quantity = sum(breakdown.values())
+        material, labor, overhead = production_costs(bom[product_id], quantity)
+        orders.append(ProductionOrder(
+            order_number=f"PO{today.strftime('%Y%m%d')}-{batch}-{position:04d}",
+            product_id=product_id,
+            quantity=quantity,
+            size_breakdown=dict(breakdown),
+            expected_completion=today + timedelta(days=production_days),
+            material_cost=material,
+            labor_cost=labor,
+            overhead_cost=overhead,
+            total_cost=material + labor + overhead,
+            created_by=created_by,
+        ))
+
+    with transaction.atomic():
+        ProductionOrder.objects.bulk_create(orders, batch_size=1000)
+        amounts = [(order, line_totals[sku]) for order, sku in zip(orders, breakdowns)]
+        if not reserve_credit_for_orders(customer.pk, amounts):
+            transaction.set_rollback(True)
+            return [], [{'error': f"Order total {quote['total']} exceeds the available credit limit"}]
+    return orders, []
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from products.ledger import create_checkpoint, latest_checkpoint_date, post_entries, unposted_entries
+
+class Command(BaseCommand):
+    help = 'Post unposted journal entries to the ledger and take periodic balance checkpoints'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--checkpoint-date', help='Take a checkpoint through this date (YYYY-MM-DD)')
+        parser.add_argument('--no-checkpoint', action='store_true', help='Only post entries')
+    
+    def handle(self, *args, **options):
+        posted = 0
+        rejected = {}
+        while True:
+            batch = list(unposted_entries().exclude(pk__in=list(rejected))[:options['batch_size']])
+            if not batch:
+                break
+            try:
+                posted += post_entries(batch)
+            except ValidationError as exc:
+                # Retry the batch without the invalid entries
+                rejected.update(exc.message_dict)
+        
+        self.stdout.write(self.style.SUCCESS(f'Posted {posted} journal entries'))
+        for entry_id, problems in rejected.items():
+            self.stdout.write(self.style.WARNING(f'Skipped entry {entry_id}: {" ".join(problems)}'))
+        
+        if options['no_checkpoint']:
+            return
+        
+        checkpoint_date = self._checkpoint_date(options['checkpoint_date'])
+        if checkpoint_date:
+            accounts = create_checkpoint(checkpoint_date)
+            self.stdout.write(self.style.SUCCESS(f'Checkpointed {accounts} accounts through {checkpoint_date}'))
+    
+    def _checkpoint_date(self, value):
+        if value:
+            try:
+                checkpoint_date = parse_date(value)
+            except ValueError:
+                checkpoint_date = None
+            if checkpoint_date is None:
+                raise CommandError(f'Invalid --checkpoint-date: {value}')
+            return checkpoint_date
+        
+        # Automatic checkpoint once the last one is older than the configured interval
+        yesterday = timezone.now().date() - timedelta(days=1)
+        interval = settings.FOOTWEAR_SETTINGS.get('LEDGER_CHECKPOINT_DAYS', 30)
+        latest = latest_checkpoint_date()
+        if latest is None or (yesterday - latest).days >= interval:
+            return yesterday
+        return None
@@ -0,0 +1,112 @@
+# Query planning for serializers: select_related / prefetch_related from the field tree
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+def _serializer(serializer):
+    """The per-row serializer of a serializer that may be many=True"""
+    if isinstance(serializer, serializers.ListSerializer):
+        return serializer.child
+    return serializer
+
+def _hinted(model, paths):
+    """Relation paths named in prefetch_hints, split into single-valued and multi-valued"""
+    select, prefetch = [], []
+    for path in paths:
+        current = model
+        single = True
+        for part in path.split('__'):
+            field = current._meta.get_field(part)
+            single = single and (field.many_to_one or field.one_to_one)
+            current = field.related_model
+        (select if single else prefetch).append((path, None))
+    return [path for path, queryset in select], prefetch
+
+def _plan(serializer, model):
+    """
+    (select_related paths, [(prefetch path, queryset or None)]) for one serializer.
+
+    Single-valued relations that are serialized in full are joined; multi-
+    valued ones get their own prefetch query, whose queryset carries the
+    plan of the nested serializer. Relations rendered as primary keys only
+    need a query when they are multi-valued.
+    """
+    select = []
+    prefetch = []
+    hints = getattr(serializer, 'prefetch_hints', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in hints:
+            hinted_select, hinted_prefetch = _hinted(model, hints[name])
+            select.extend(hinted_select)
+            prefetch.extend(hinted_prefetch)
+        if field.source == '*' or len(field.source_attrs) != 1:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+        related_model = model_field.related_model
+        single = model_field.many_to_one or model_field.one_to_one
+
+        if isinstance(field, serializers.BaseSerializer):
+            child_select, child_prefetch = _plan(_serializer(field), related_model)
+            if single:
+                select.append(field.source)
+                select.extend(f'{field.source}__{path}' for path in child_select)
+                prefetch.extend((f'{field.source}__{path}', queryset) for path, queryset in child_prefetch)
+            else:
+                queryset = related_model._default_manager.all()
+                if child_select:
+                    queryset = queryset.select_related(*child_select)
+                if child_prefetch:
+                    queryset = queryset.prefetch_related(*_lookups(child_prefetch))
+                prefetch.append((field.source, queryset))
+        elif isinstance(field, ManyRelatedField):
+            # Only the primary keys are rendered
+            if model_field.one_to_many:
+                queryset = related_model._default_manager.only('pk', model_field.field.name)
+            else:
+                queryset = related_model._default_manager.only('pk')
+            prefetch.append((field.source, queryset))
+    return select, prefetch
+
+def _lookups(prefetch):
+    """Prefetch lookups, one per path; a planned queryset wins over a bare path"""
+    querysets = {}
+    for path, queryset in prefetch:
+        if querysets.get(path) is None:
+            querysets[path] = queryset
+    return [
+        Prefetch(path, queryset=queryset) if queryset is not None else path
+        for path, queryset in querysets.items()
+    ]
+
+def prefetch_plan(serializer):
+    """
+    (select_related, prefetch_related) lookups that serializing with this
+    serializer instance needs, given the fields and expansions it was built
+    with. Serializing a page then costs a fixed number of queries.
+    """
+    serializer = _serializer(serializer)
+    select, prefetch = _plan(serializer, serializer.Meta.model)
+    return sorted(set(select)), _lookups(prefetch)
+
+def optimize_queryset(queryset, serializer):
+    """Apply the serializer's prefetch plan to a queryset"""
+    select, prefetch = prefetch_plan(serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+class PlannedQuerysetMixin:
+    """GenericAPIView mixin that applies the serializer's prefetch plan to get_queryset()"""
+
+    def get_queryset(self):
+        return optimize_queryset(super().get_queryset(), self.get_serializer())
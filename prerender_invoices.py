@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from products.documents import render_invoice_document, stale_invoice_ids
+
+class Command(BaseCommand):
+    help = 'Render and store documents for finalized invoices that are missing or out of date'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Render at most this many invoices')
+    
+    def handle(self, *args, **options):
+        invoice_ids = stale_invoice_ids()
+        if options['limit']:
+            invoice_ids = invoice_ids[:options['limit']]
+        
+        rendered = 0
+        for invoice_id in invoice_ids.iterator(chunk_size=500):
+            render_invoice_document(invoice_id)
+            rendered += 1
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} invoice documents'))
@@ -0,0 +1,146 @@
+# Precomputed tier price lists and batch quotes
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+
+from .models import FootwearProduct, PriceListEntry, WholesaleCustomer
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+MAX_QUOTE_LINES = 2000
+
+def tier_unit_price(base_price, multiplier, discount_percentage):
+    """Quantity-break price less a tier discount, rounded to the cent"""
+    price = base_price * multiplier * (HUNDRED - Decimal(discount_percentage)) / HUNDRED
+    return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def discount_tiers():
+    """{tier: discount percentage}, with '' for customers without a tier"""
+    return {'': 0, **WholesaleCustomer.DISCOUNT_PERCENTAGES}
+
+def _entries_for(product_id, base_price, tiers):
+    return [
+        PriceListEntry(
+            product_id=product_id,
+            discount_tier=tier,
+            min_quantity=min_quantity,
+            unit_price=tier_unit_price(base_price, multiplier, discount),
+        )
+        for tier, discount in tiers.items()
+        for min_quantity, multiplier in FootwearProduct.QUANTITY_BREAKS
+    ]
+
+def refresh_price_lists(product_ids=None, batch_size=1000):
+    """
+    Rebuild the price list rows of the given products (all when None).
+
+    Rows are upserted in batches, so refreshing a single product after a
+    base_price change is one statement. Only new rows and rows whose price
+    changed are written, so the catalog change feed sees real changes
+    only. Returns the number of rows written.
+    """
+    tiers = discount_tiers()
+    products = FootwearProduct.objects.order_by('pk').values_list('pk', 'base_price')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    written = 0
+    batch = []
+    for product_id, base_price in products.iterator(chunk_size=batch_size):
+        batch.extend(_entries_for(product_id, base_price, tiers))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+def _upsert(entries):
+    """Write new rows and rows whose price changed; unchanged rows keep their updated_at"""
+    current = dict(
+        ((product_id, tier, min_quantity), unit_price)
+        for product_id, tier, min_quantity, unit_price in PriceListEntry.objects.filter(
+            product_id__in={entry.product_id for entry in entries}
+        ).values_list('product_id', 'discount_tier', 'min_quantity', 'unit_price')
+    )
+    entries = [
+        entry for entry in entries
+        if current.get((entry.product_id, entry.discount_tier, entry.min_quantity)) != entry.unit_price
+    ]
+    if not entries:
+        return 0
+    with transaction.atomic():
+        PriceListEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['product', 'discount_tier', 'min_quantity'],
+            update_fields=['unit_price', 'updated_at'],
+        )
+    return len(entries)
+
+def quote_cart(lines, customer=None):
+    """
+    Price a cart of (sku, quantity) lines for a customer in one call.
+
+    SKUs and the customer's tier price list are each read with one query;
+    every line is then priced in memory against the precomputed breaks.
+    Products missing from the price list are priced from base_price.
+    """
+    tier = customer.discount_tier if customer else ''
+    discount = customer.get_discount_percentage() if customer else 0
+
+    skus = {sku for sku, quantity in lines}
+    products = {
+        sku: (pk, name, base_price)
+        for sku, pk, name, base_price in FootwearProduct.objects.filter(
+            sku__in=skus, active=True
+        ).values_list('sku', 'pk', 'name', 'base_price')
+    }
+    breaks = defaultdict(list)
+    entries = PriceListEntry.objects.filter(
+        product_id__in=[pk for pk, name, base_price in products.values()], discount_tier=tier
+    ).order_by('product_id', '-min_quantity').values_list('product_id', 'min_quantity', 'unit_price')
+    for product_id, min_quantity, unit_price in entries:
+        breaks[product_id].append((min_quantity, unit_price))
+
+    quoted = []
+    errors = []
+    total = Decimal('0.00')
+    for position, (sku, quantity) in enumerate(lines):
+        if sku not in products:
+            errors.append({'line': position, 'sku': sku, 'error': 'Unknown or inactive SKU'})
+            continue
+        if quantity < 1:
+            errors.append({'line': position, 'sku': sku, 'error': 'Quantity must be at least 1'})
+            continue
+        product_id, name, base_price = products[sku]
+        unit_price = next(
+            (price for min_quantity, price in breaks[product_id] if quantity >= min_quantity), None
+        )
+        if unit_price is None:
+            multiplier = next(
+                (multiplier for min_quantity, multiplier in FootwearProduct.QUANTITY_BREAKS if quantity >= min_quantity),
+                Decimal('1'),
+            )
+            unit_price = tier_unit_price(base_price, multiplier, discount)
+        line_total = unit_price * quantity
+        total += line_total
+        quoted.append({
+            'line': position,
+            'sku': sku,
+            'product_id': product_id,
+            'name': name,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'line_total': line_total,
+        })
+
+    return {
+        'discount_tier': tier,
+        'discount_percentage': discount,
+        'lines': quoted,
+        'errors': errors,
+        'total': total,
+    }
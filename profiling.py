@@ -0,0 +1,189 @@
+# On-demand cProfile runs for requests, kept in an on-disk ring buffer
+import cProfile
+import io
+import json
+import pstats
+import random
+import re
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, quote
+
+from django.conf import settings
+
+NAME_PATTERN = re.compile(r'^[\w-]+$')
+SORT_KEYS = ['cumulative', 'tottime', 'ncalls']
+
+def _setting(name, default):
+    return settings.FOOTWEAR_SETTINGS.get(name, default)
+
+def profile_dir():
+    return Path(_setting('PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+def _slug(path):
+    return re.sub(r'[^\w]+', '-', path).strip('-')[:60] or 'root'
+
+def redact_query(query):
+    """'page=2&token=abc' -> 'page=*&token=*': parameter names only, values can hold secrets"""
+    return '&'.join(f'{quote(name)}=*' for name, value in parse_qsl(query, keep_blank_values=True))
+
+def profile_name(method, path):
+    """Name of a new profile; names sort by the time they were taken"""
+    return f"{datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{method}-{_slug(path)}"
+
+def save_profile(profiler, meta, name=None):
+    """Write profile_dir()/<name>.prof and <name>.json, dropping the oldest beyond PROFILE_KEEP; returns the name"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = name or profile_name(meta['method'], meta['path'])
+    profiler.dump_stats(directory / f'{name}.prof')
+    created = datetime.now(dt_timezone.utc).isoformat()
+    (directory / f'{name}.json').write_text(json.dumps({**meta, 'name': name, 'created': created}))
+
+    keep = max(1, int(_setting('PROFILE_KEEP', 50)))
+    for old in sorted(directory.glob('*.prof'))[:-keep]:
+        old.unlink(missing_ok=True)
+        old.with_suffix('.json').unlink(missing_ok=True)
+    return name
+
+def recent_profiles():
+    """Metadata of the stored profiles, newest first"""
+    profiles = []
+    for path in sorted(profile_dir().glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+def profile_path(name):
+    """Path of a stored profile, or None for unknown or malformed names"""
+    if not NAME_PATTERN.match(name):
+        return None
+    path = profile_dir() / f'{name}.prof'
+    return path if path.exists() else None
+
+def stats_text(path, sort='cumulative', limit=60):
+    """pstats report of the top functions"""
+    output = io.StringIO()
+    stats = pstats.Stats(str(path), stream=output)
+    stats.strip_dirs().sort_stats(sort if sort in SORT_KEYS else 'cumulative').print_stats(limit)
+    return output.getvalue()
+
+def profiled_stream(content, profiler, finished):
+    """Iterate streaming content under profiler, then call finished() once the stream closes"""
+    iterator = iter(content)
+    done = object()
+    try:
+        while True:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is running in this thread; leave this chunk out
+                chunk = next(iterator, done)
+            else:
+                try:
+                    chunk = next(iterator, done)
+                finally:
+                    profiler.disable()
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        finished()
+
+def _label(func):
+    filename, line, name = func
+    return f'{name} ({Path(filename).name}:{line})' if line else name
+
+def collapsed_stacks(path, min_microseconds=1):
+    """
+    Flamegraph-ready 'frame;frame;frame microseconds' lines.
+
+    cProfile keeps caller/callee pairs rather than whole stacks, so the
+    stacks are rebuilt from the call graph: a function's time is shared
+    between its callers in proportion to the time each call edge took.
+    Recursion is cut at the first repeat of a frame.
+    """
+    stats = pstats.Stats(str(path)).stats
+    children = {}
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, (cc, nc, tt, ct, callers) in stats.items() if not callers]
+    lines = {}
+
+    def walk(func, stack, share):
+        cc, nc, tt, ct, callers = stats[func]
+        stack = stack + [_label(func)]
+        own = tt * share * 1e6
+        if own >= min_microseconds:
+            key = ';'.join(stack)
+            lines[key] = lines.get(key, 0) + own
+        for child, edge_time in children.get(func, []):
+            child_total = stats[child][3]
+            path_time = edge_time * share
+            if child_total and path_time * 1e6 >= min_microseconds and _label(child) not in stack:
+                walk(child, stack, path_time / child_total)
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return ''.join(f'{stack} {round(value)}\n' for stack, value in sorted(lines.items()))
+
+class ProfilingMiddleware:
+    """
+    Run a request under cProfile and store the profile.
+
+    Staff requests are profiled with an X-Profile header or ?profile=1,
+    and get the profile's name back in X-Profile-Id; PROFILE_SAMPLE_RATE
+    profiles a share of all requests. Profiles go to PROFILE_DIR, which
+    keeps the latest PROFILE_KEEP. Streaming responses are profiled until
+    the stream closes and saved then. Goes after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = float(_setting('PROFILE_SAMPLE_RATE', 0))
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        requested = bool(
+            user is not None and user.is_staff
+            and (request.headers.get('X-Profile') or request.GET.get('profile'))
+        )
+        if not requested and (not self.sample_rate or random.random() >= self.sample_rate):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this thread
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        name = profile_name(request.method, request.path)
+
+        def finished():
+            save_profile(profiler, {
+                'method': request.method,
+                'path': request.path,
+                'query': redact_query(request.META.get('QUERY_STRING', '')),
+                'status': response.status_code,
+                'user': user.get_username() if user is not None and user.is_authenticated else None,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+                'requested': requested,
+                'streaming': response.streaming,
+            }, name)
+
+        if response.streaming:
+            response.streaming_content = profiled_stream(response.streaming_content, profiler, finished)
+        else:
+            finished()
+        if requested:
+            response['X-Profile-Id'] = name
+        return response
@@ -0,0 +1,41 @@
+from decimal import Decimal, InvalidOperation
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products.reconciliation import reconcile_statement
+
+class Command(BaseCommand):
+    help = 'Reconcile a bank statement CSV against open invoices and record the payments'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path to the bank statement CSV')
+        parser.add_argument('--tolerance', help='Maximum amount difference for fallback matching')
+        parser.add_argument('--processed-by', help='Username recorded on the payments, defaults to the first superuser')
+        parser.add_argument('--dry-run', action='store_true', help='Match only, do not record payments')
+    
+    def handle(self, *args, **options):
+        tolerance = None
+        if options['tolerance']:
+            try:
+                tolerance = Decimal(options['tolerance'])
+            except InvalidOperation:
+                raise CommandError(f"Invalid --tolerance: {options['tolerance']}")
+        
+        if options['processed_by']:
+            processed_by = User.objects.filter(username=options['processed_by']).first()
+        else:
+            processed_by = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if processed_by is None:
+            raise CommandError('No user found to record as payment processor')
+        
+        with open(options['statement'], newline='', encoding='utf-8-sig') as stream:
+            summary = reconcile_statement(stream, processed_by, tolerance=tolerance, dry_run=options['dry_run'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Matched {summary['matched']} lines, skipped {summary['duplicates']} already recorded"
+        ))
+        for rule, count in sorted(summary['rules'].items()):
+            self.stdout.write(f'  {rule}: {count}')
+        for line in summary['unmatched']:
+            self.stdout.write(self.style.WARNING(
+                f"Unmatched line {line['line_number']}: {line['amount']} {line['reference']}"
+            ))
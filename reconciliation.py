@@ -0,0 +1,252 @@
+# Bank statement reconciliation against open invoices
+import bisect
+import csv
+import hashlib
+import re
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date
+
+from accounting.models import Invoice, Payment
+from .credit import apply_balance_changes, invoice_balances
+from .documents import refresh_invoice_documents
+from .models import ReconciledStatementLine, WholesaleCustomer
+
+OPEN_STATUSES = ['sent', 'partial', 'overdue']
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+TOKEN_RE = re.compile(r'[A-Z0-9][A-Z0-9-]*')
+
+StatementLine = namedtuple('StatementLine', ['line_number', 'date', 'amount', 'reference', 'description'])
+
+class _OpenInvoice:
+    __slots__ = ['pk', 'number', 'customer_id', 'due_date', 'balance', 'total_amount', 'paid']
+
+    def __init__(self, pk, number, customer_id, due_date, total_amount, paid):
+        self.pk = pk
+        self.number = number
+        self.customer_id = customer_id
+        self.due_date = due_date
+        self.total_amount = total_amount
+        self.paid = paid
+        self.balance = total_amount - paid
+
+class InvoiceIndex:
+    """
+    In-memory hash indexes over open invoices.
+
+    Invoices are looked up by number, by customer reference (tax id or
+    username) and by exact open balance; a sorted list of balances serves
+    the tolerance fallback with a binary search.
+    """
+    def __init__(self, invoices, customer_refs):
+        self.by_number = {}
+        self.by_customer = defaultdict(list)
+        self.by_amount = defaultdict(list)
+        for invoice in sorted(invoices, key=lambda inv: (inv.due_date, inv.pk)):
+            self.by_number[invoice.number.upper()] = invoice
+            self.by_customer[invoice.customer_id].append(invoice)
+            self.by_amount[invoice.balance].append(invoice)
+        self.customer_refs = customer_refs
+        self.amounts = sorted(self.by_amount)
+
+    def _open(self, candidates):
+        return [invoice for invoice in candidates if invoice.balance > 0]
+
+    def match(self, line, tolerance):
+        """Return (invoice, rule) for a statement line, or (None, None)"""
+        tokens = TOKEN_RE.findall(f'{line.reference} {line.description}'.upper())
+
+        for token in tokens:
+            invoice = self.by_number.get(token)
+            if invoice and invoice.balance > 0:
+                return invoice, 'invoice_number'
+
+        for token in tokens:
+            customer_id = self.customer_refs.get(token)
+            if customer_id is None:
+                continue
+            # Only an exact open balance; otherwise the amount rules decide
+            for invoice in self._open(self.by_customer.get(customer_id, [])):
+                if invoice.balance == line.amount:
+                    return invoice, 'customer_reference'
+
+        candidates = self._open(self.by_amount.get(line.amount, []))
+        if len(candidates) == 1:
+            return candidates[0], 'amount'
+
+        if tolerance:
+            low = bisect.bisect_left(self.amounts, line.amount - tolerance)
+            high = bisect.bisect_right(self.amounts, line.amount + tolerance)
+            nearby = [
+                invoice
+                for amount in self.amounts[low:high]
+                for invoice in self._open(self.by_amount[amount])
+            ]
+            if len(nearby) == 1:
+                return nearby[0], 'tolerance'
+        return None, None
+
+    def apply(self, invoice, amount, tolerance=Decimal('0')):
+        """
+        Record an allocation so later lines see the reduced balance.
+
+        A remainder within tolerance is settled, so an invoice matched by
+        the tolerance rule ends up paid rather than partial.
+        """
+        paid = min(amount, invoice.balance)
+        invoice.balance -= paid
+        invoice.paid += paid
+        if 0 < invoice.balance <= tolerance:
+            invoice.balance = Decimal('0')
+        return paid
+
+def load_open_invoices():
+    paid = Payment.objects.filter(
+        invoice=OuterRef('pk'), status='completed'
+    ).values('invoice').annotate(total=Sum('amount')).values('total')
+    rows = Invoice.objects.filter(status__in=OPEN_STATUSES).annotate(
+        paid_amount=Coalesce(Subquery(paid, output_field=MONEY), Value(Decimal('0')), output_field=MONEY),
+    ).values_list('pk', 'invoice_number', 'customer_id', 'due_date', 'total_amount', 'paid_amount')
+    return [_OpenInvoice(*row) for row in rows.iterator(chunk_size=5000)]
+
+def load_customer_refs():
+    """{normalized reference: user id} from wholesale tax ids and usernames"""
+    refs = {}
+    for user_id, tax_id, username in WholesaleCustomer.objects.values_list('user_id', 'tax_id', 'user__username'):
+        for ref in (username, tax_id):
+            if ref:
+                refs[ref.upper()] = user_id
+    return refs
+
+def read_statement(stream):
+    """
+    Yield StatementLine tuples from a CSV stream without loading it whole.
+
+    Expects date, amount and reference columns (description is optional);
+    header names are matched case-insensitively. Debits (negative amounts)
+    and unparseable rows are skipped.
+    """
+    reader = csv.DictReader(stream)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            amount = Decimal((row.get('amount') or '').replace(',', '').strip())
+            line_date = parse_date((row.get('date') or '').strip())
+        except (InvalidOperation, ValueError):
+            continue
+        if line_date is None or amount <= 0:
+            continue
+        yield StatementLine(
+            line_number, line_date, amount,
+            (row.get('reference') or '').strip(), (row.get('description') or '').strip(),
+        )
+
+def line_key(line, occurrence):
+    """
+    Identity of a statement line across imports: its content plus how many
+    identical lines came before it in the same statement, so two equal
+    transfers on one day stay two payments.
+    """
+    content = '|'.join([line.date.isoformat(), f'{line.amount:.2f}', line.reference, line.description, str(occurrence)])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def reconcile_statement(stream, processed_by, tolerance=None, dry_run=False, batch_size=1000):
+    """
+    Match a bank statement to open invoices and record the payments in bulk.
+
+    Open invoices and customer references are loaded once into hash
+    indexes, so each statement line is matched in memory. Every posted
+    line is recorded by its line_key and lines already recorded are
+    skipped, which makes re-importing the same statement harmless. Returns a summary dict with
+    counts and the unmatched lines.
+    """
+    if tolerance is None:
+        tolerance = Decimal(str(settings.FOOTWEAR_SETTINGS.get('RECONCILIATION_TOLERANCE', '0.00')))
+    index = InvoiceIndex(load_open_invoices(), load_customer_refs())
+
+    summary = {'matched': 0, 'duplicates': 0, 'unmatched': [], 'rules': defaultdict(int)}
+    payments = []
+    keys = []
+    touched = {}
+    occurrences = Counter()
+    for batch in _batched(read_statement(stream), batch_size):
+        batch_keys = []
+        for line in batch:
+            content = line[1:]
+            batch_keys.append(line_key(line, occurrences[content]))
+            occurrences[content] += 1
+        seen = set(ReconciledStatementLine.objects.filter(
+            line_key__in=batch_keys
+        ).values_list('line_key', flat=True))
+        for line, key in zip(batch, batch_keys):
+            if key in seen:
+                summary['duplicates'] += 1
+                continue
+            invoice, rule = index.match(line, tolerance)
+            if invoice is None:
+                summary['unmatched'].append(line._asdict())
+                continue
+            index.apply(invoice, line.amount, tolerance)
+            touched[invoice.pk] = invoice
+            summary['matched'] += 1
+            summary['rules'][rule] += 1
+            keys.append(key)
+            payments.append(Payment(
+                invoice_id=invoice.pk,
+                amount=line.amount,
+                payment_date=line.date,
+                payment_method='bank_transfer',
+                reference_number=line.reference,
+                status='completed',
+                processed_by=processed_by,
+                notes=f'Bank statement line {line.line_number} ({rule} match)',
+            ))
+
+    summary['rules'] = dict(summary['rules'])
+    if dry_run:
+        return summary
+
+    with transaction.atomic():
+        balances = invoice_balances(touched)
+        Payment.objects.bulk_create(payments, batch_size=batch_size)
+        ReconciledStatementLine.objects.bulk_create([
+            ReconciledStatementLine(line_key=key, payment=payment)
+            for key, payment in zip(keys, payments)
+        ], batch_size=batch_size)
+        _update_invoice_statuses(touched.values(), payments)
+        apply_balance_changes(balances, invoice_balances(touched))
+        refresh_invoice_documents(touched)
+    return summary
+
+def _update_invoice_statuses(invoices, payments):
+    last_payment = {}
+    for payment in payments:
+        last_payment[payment.invoice_id] = max(payment.payment_date, last_payment.get(payment.invoice_id, payment.payment_date))
+    updates = []
+    for invoice in invoices:
+        row = Invoice(pk=invoice.pk)
+        if invoice.balance <= 0:
+            row.status = 'paid'
+            row.paid_date = last_payment[invoice.pk]
+        else:
+            row.status = 'partial'
+            row.paid_date = None
+        updates.append(row)
+    Invoice.objects.bulk_update(updates, ['status', 'paid_date'], batch_size=1000)
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from products.pricing import refresh_price_lists
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed tier and quantity-break price lists'
+    
+    def handle(self, *args, **options):
+        rows = refresh_price_lists()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} price list entries'))
@@ -0,0 +1,101 @@
+import json
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils.dateparse import parse_date
+from products.db_routers import REPLICA
+from products.benchmarks import benchmark_staff, budgets_from, dump, run_benchmarks
+from products.synthetic import already_generated, generate
+
+class Command(BaseCommand):
+    help = 'Benchmark view and API latency and query counts against a generated dataset and the checked-in budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budgets', default=str(settings.BASE_DIR / 'benchmark_budgets.json'),
+                            help='Budgets file, which also describes the dataset')
+        parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results, - for stdout')
+        parser.add_argument('--iterations', type=int, default=20, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per scenario')
+        parser.add_argument('--only', nargs='+', help='Scenario names to run')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the benchmark database and its dataset between runs')
+        parser.add_argument('--update-budgets', action='store_true',
+                            help='Write budgets from this run instead of failing on them')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        try:
+            with open(options['budgets']) as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['budgets']}: {e}")
+        dataset = dict(config.get('dataset', {}))
+        if dataset.get('as_of'):
+            dataset['as_of'] = parse_date(dataset['as_of'])
+
+        # A throwaway test database, so the benchmark never touches real data
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        # Replica-routed views must read the benchmark data, not the real replica
+        replica_name = None
+        if REPLICA in connections:
+            replica = connections[REPLICA]
+            replica_name = replica.settings_dict['NAME']
+            replica.close()
+            replica.creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            if not already_generated():
+                self.stderr.write('Generating dataset...')
+                generate(benchmark_staff(), log=lambda message: self.stderr.write(f'  {message}'), **dataset)
+            results = run_benchmarks(
+                config.get('budgets', {}),
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                only=options['only'],
+            )
+            vendor = connection.vendor
+        finally:
+            if replica_name is not None:
+                connections[REPLICA].close()
+                connections[REPLICA].settings_dict['NAME'] = replica_name
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'database': vendor,
+            'dataset': config.get('dataset', {}),
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['output'] == '-':
+            dump(report, sys.stdout)
+        else:
+            with open(options['output'], 'w') as f:
+                dump(report, f)
+
+        failed = 0
+        for name, result in results.items():
+            if 'skipped' in result:
+                self.stderr.write(self.style.WARNING(f"{name}: skipped, {result['skipped']}"))
+                continue
+            line = f"{name}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, {result['queries']} queries"
+            if result['failures'] and not options['update_budgets']:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{line} - {', '.join(result['failures'])}"))
+            else:
+                self.stderr.write(line)
+
+        if options['update_budgets']:
+            config['budgets'] = {**config.get('budgets', {}), **budgets_from(results)}
+            with open(options['budgets'], 'w') as f:
+                dump(config, f)
+            self.stderr.write(self.style.SUCCESS(f"Updated {options['budgets']}"))
+        elif not config.get('budgets'):
+            raise CommandError(f"No budgets in {options['budgets']}; run with --update-budgets and commit the file")
+        elif failed:
+            raise CommandError(f'{failed} scenarios over budget')
+        else:
+            self.stderr.write(self.style.SUCCESS(f'All {len(results)} scenarios within budget'))
@@ -0,0 +1,32 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from products.costing import costing_method, run_costing, valuation_as_of
+
+class Command(BaseCommand):
+    help = 'Cost new production receipts and invoiced issues into inventory'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=['fifo', 'average'], help='Defaults to INVENTORY_COSTING_METHOD')
+        parser.add_argument('--as-of', help='Print the inventory valuation as of this date (YYYY-MM-DD)')
+    
+    def handle(self, *args, **options):
+        method = options['method'] or costing_method()
+        costed = run_costing(method)
+        self.stdout.write(self.style.SUCCESS(f'Costed {costed} new inventory movements ({method})'))
+        
+        if options['as_of']:
+            try:
+                as_of = parse_date(options['as_of'])
+            except ValueError:
+                as_of = None
+            if as_of is None:
+                raise CommandError(f"Invalid --as-of date: {options['as_of']}")
+            
+            valuation = valuation_as_of(as_of)
+            total_value = sum((value for quantity, value in valuation.values()), Decimal('0.00'))
+            total_quantity = sum(quantity for quantity, value in valuation.values())
+            self.stdout.write(
+                f'Inventory as of {as_of}: {total_quantity} units across '
+                f'{len(valuation)} products, valued at {total_value}'
+            )
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
 from products.models import (
     FootwearProduct, FootwearCategory, Material, SizeChart, SizeConversion,
     BillOfMaterials, WholesaleCustomer, CustomDesign, ProductionOrder
@@ -8,50 +9,125 @@ from accounting.models import (
     Invoice, InvoiceItem, Payment, ChartOfAccounts, JournalEntry,
     TaxRate, InventoryValuation
 )
+from products.credit import apply_balance_changes, invoice_balances
+from products.documents import refresh_invoice_documents
+from products.instrumentation import timed
+
+def _path_tree(paths):
+    """'id,product.sku,product.category' -> {'id': [], 'product': ['sku', 'category']}"""
+    if isinstance(paths, str):
+        paths = paths.split(',')
+    tree = {}
+    for path in paths:
+        head, _, rest = path.strip().partition('.')
+        if head:
+            tree.setdefault(head, [])
+            if rest:
+                tree[head].append(rest)
+    return tree
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and on-demand expansion of nested relations.
+
+    Relations in expandable_fields render as primary keys unless named in
+    ?expand= (or the expand kwarg); ?fields= limits the output to the given
+    fields. Both take dotted paths into nested serializers, e.g.
+    ?expand=product.category&fields=id,order_number,product.sku
+    """
+    expandable_fields = {}
+    # {field name: relation paths} for computed fields that read relations
+    prefetch_hints = {}
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        # Only the top-level serializer has the request; nested ones are
+        # handed their share of the paths by their parent
+        request = self.context.get('request')
+        if request is not None:
+            if fields is None:
+                fields = request.GET.get('fields')
+            if expand is None:
+                expand = request.GET.get('expand')
+        self._field_tree = _path_tree(fields or [])
+        self._expand_tree = _path_tree(expand or [])
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        for name, (serializer_class, options) in self.expandable_fields.items():
+            if name in self._expand_tree:
+                fields[name] = serializer_class(
+                    read_only=True,
+                    fields=self._field_tree.get(name) or None,
+                    expand=self._expand_tree[name],
+                    **options
+                )
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **options)
+        if self._field_tree:
+            fields = {name: field for name, field in fields.items() if name in self._field_tree}
+        return fields
+    
+    def to_representation(self, instance):
+        # Timed once per top-level row; nested serializers are part of it
+        parent = self.parent
+        if parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            with timed('serializer'):
+                return super().to_representation(instance)
+        return super().to_representation(instance)
 
 # User serializers
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_active']
         read_only_fields = ['id']
 
 # Product serializers
-class FootwearCategorySerializer(serializers.ModelSerializer):
+class FootwearCategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = FootwearCategory
         fields = '__all__'
 
-class MaterialSerializer(serializers.ModelSerializer):
+class MaterialSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Material
         fields = '__all__'
 
-class SizeChartSerializer(serializers.ModelSerializer):
+class SizeChartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SizeChart
         fields = '__all__'
 
-class SizeConversionSerializer(serializers.ModelSerializer):
-    size_chart = SizeChartSerializer(read_only=True)
+class SizeConversionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'size_chart': (SizeChartSerializer, {}),
+    }
     
     class Meta:
         model = SizeConversion
         fields = '__all__'
 
-class BillOfMaterialsSerializer(serializers.ModelSerializer):
-    material = MaterialSerializer(read_only=True)
+class BillOfMaterialsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'material': (MaterialSerializer, {}),
+    }
+    prefetch_hints = {'cost': ['material']}
     cost = serializers.ReadOnlyField()
     
     class Meta:
         model = BillOfMaterials
         fields = '__all__'
 
-class FootwearProductSerializer(serializers.ModelSerializer):
-    category = FootwearCategorySerializer(read_only=True)
-    available_materials = MaterialSerializer(many=True, read_only=True)
-    available_sizes = SizeConversionSerializer(many=True, read_only=True)
-    bom_items = BillOfMaterialsSerializer(many=True, read_only=True)
+class FootwearProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'category': (FootwearCategorySerializer, {}),
+        'available_materials': (MaterialSerializer, {'many': True}),
+        'available_sizes': (SizeConversionSerializer, {'many': True}),
+        'bom_items': (BillOfMaterialsSerializer, {'many': True}),
+    }
     
     class Meta:
         model = FootwearProduct
@@ -62,64 +138,76 @@ class FootwearProductCreateSerializer(serializers.ModelSerializer):
         model = FootwearProduct
         fields = '__all__'
 
-class WholesaleCustomerSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class WholesaleCustomerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': (UserSerializer, {}),
+    }
     discount_percentage = serializers.ReadOnlyField()
     
     class Meta:
         model = WholesaleCustomer
         fields = '__all__'
 
-class CustomDesignSerializer(serializers.ModelSerializer):
-    customer = UserSerializer(read_only=True)
-    base_product = FootwearProductSerializer(read_only=True)
-    selected_materials = MaterialSerializer(many=True, read_only=True)
-    size = SizeConversionSerializer(read_only=True)
+class CustomDesignSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'customer': (UserSerializer, {}),
+        'base_product': (FootwearProductSerializer, {}),
+        'selected_materials': (MaterialSerializer, {'many': True}),
+        'size': (SizeConversionSerializer, {}),
+    }
     
     class Meta:
         model = CustomDesign
         fields = '__all__'
 
-class ProductionOrderSerializer(serializers.ModelSerializer):
-    product = FootwearProductSerializer(read_only=True)
-    custom_design = CustomDesignSerializer(read_only=True)
-    created_by = UserSerializer(read_only=True)
+class ProductionOrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'product': (FootwearProductSerializer, {}),
+        'custom_design': (CustomDesignSerializer, {}),
+        'created_by': (UserSerializer, {}),
+    }
     
     class Meta:
         model = ProductionOrder
         fields = '__all__'
 
 # Accounting serializers
-class TaxRateSerializer(serializers.ModelSerializer):
+class TaxRateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = TaxRate
         fields = '__all__'
 
-class ChartOfAccountsSerializer(serializers.ModelSerializer):
+class ChartOfAccountsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ChartOfAccounts
         fields = '__all__'
 
-class InvoiceItemSerializer(serializers.ModelSerializer):
-    product = FootwearProductSerializer(read_only=True)
+class InvoiceItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'product': (FootwearProductSerializer, {}),
+    }
     
     class Meta:
         model = InvoiceItem
         fields = '__all__'
 
-class PaymentSerializer(serializers.ModelSerializer):
-    processed_by = UserSerializer(read_only=True)
+class PaymentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'processed_by': (UserSerializer, {}),
+    }
     
     class Meta:
         model = Payment
         fields = '__all__'
 
-class InvoiceSerializer(serializers.ModelSerializer):
-    customer = UserSerializer(read_only=True)
-    wholesale_customer = WholesaleCustomerSerializer(read_only=True)
-    items = InvoiceItemSerializer(many=True, read_only=True)
-    payments = PaymentSerializer(many=True, read_only=True)
-    created_by = UserSerializer(read_only=True)
+class InvoiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'customer': (UserSerializer, {}),
+        'wholesale_customer': (WholesaleCustomerSerializer, {}),
+        'items': (InvoiceItemSerializer, {'many': True}),
+        'payments': (PaymentSerializer, {'many': True}),
+        'created_by': (UserSerializer, {}),
+    }
     balance_due = serializers.ReadOnlyField()
     is_overdue = serializers.ReadOnlyField()
     
@@ -138,23 +226,66 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        invoice = Invoice.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            InvoiceItem.objects.create(invoice=invoice, **item_data)
+        with transaction.atomic():
+            invoice = Invoice.objects.create(**validated_data)
+            balances = invoice_balances([invoice.pk])
+            
+            # One insert for all items; bulk_create sends no post_save, so the
+            # document and balance follow-ups are made explicitly below
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(**{
+                    **item_data,
+                    'invoice': invoice,
+                    'total_price': item_data['unit_price'] * item_data['quantity'],
+                })
+                for item_data in items_data
+            ])
+            apply_balance_changes(balances, invoice_balances([invoice.pk]))
+            refresh_invoice_documents([invoice.pk], render=invoice.status != 'draft')
         
         return invoice
 
-class JournalEntrySerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+class BulkInvoiceItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(required=False, allow_null=True)
+    description = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    quantity = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    
+    def validate(self, data):
+        if not data.get('product') and 'unit_price' not in data:
+            raise serializers.ValidationError('unit_price is required for lines without a product.')
+        return data
+
+class BulkInvoiceRowSerializer(serializers.Serializer):
+    """Shape of one invoice in a bulk request; references are checked in bulk afterwards"""
+    customer = serializers.IntegerField()
+    wholesale_customer = serializers.IntegerField(required=False, allow_null=True)
+    invoice_date = serializers.DateField(required=False)
+    due_date = serializers.DateField(required=False)
+    billing_name = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    billing_address = serializers.CharField(required=False, allow_blank=True)
+    billing_email = serializers.EmailField(required=False, allow_blank=True)
+    billing_phone = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    tax_id = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    tax_jurisdiction = serializers.CharField(max_length=100, required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    terms_conditions = serializers.CharField(required=False, allow_blank=True)
+    items = BulkInvoiceItemSerializer(many=True, allow_empty=False)
+
+class JournalEntrySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'created_by': (UserSerializer, {}),
+    }
     is_balanced = serializers.ReadOnlyField()
     
     class Meta:
         model = JournalEntry
         fields = '__all__'
 
-class InventoryValuationSerializer(serializers.ModelSerializer):
-    product = FootwearProductSerializer(read_only=True)
+class InventoryValuationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'product': (FootwearProductSerializer, {}),
+    }
     
     class Meta:
         model = InventoryValuation
@@ -1,5 +1,8 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
+import django
+from django.core.exceptions import ImproperlyConfigured
 from django.contrib.messages import constants as messages
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'products.metrics.AccessLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -39,6 +43,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'products.instrumentation.RequestTimingMiddleware',
+    'products.profiling.ProfilingMiddleware',
+    'products.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -47,7 +54,7 @@ ROOT_URLCONF = 'footwear_saas.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'products.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,12 +71,57 @@ TEMPLATES = [
 WSGI_APPLICATION = 'footwear_saas.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgresql; DB_REPLICA_* adds a read replica
+# used by products.db_routers. Locally two SQLite files can stand in:
+#   DB_REPLICA_NAME=db_replica.sqlite3, after copying db.sqlite3 to it
+def _database_settings(prefix, default_name):
+    engine = os.environ.get('DB_ENGINE', 'sqlite')
+    config = {
+        # Persistent connections, checked before each request reuses them
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
+    if engine == 'postgresql':
+        config.update({
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get(f'{prefix}_NAME', 'footwear_saas'),
+            'USER': os.environ.get(f'{prefix}_USER', os.environ.get('DB_USER', '')),
+            'PASSWORD': os.environ.get(f'{prefix}_PASSWORD', os.environ.get('DB_PASSWORD', '')),
+            'HOST': os.environ.get(f'{prefix}_HOST', os.environ.get('DB_HOST', 'localhost')),
+            'PORT': os.environ.get(f'{prefix}_PORT', os.environ.get('DB_PORT', '5432')),
+            'OPTIONS': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5'))},
+        })
+        if os.environ.get('DB_PGBOUNCER') == 'True':
+            # Transaction pooling cannot hold a named cursor across statements
+            config['DISABLE_SERVER_SIDE_CURSORS'] = True
+        if os.environ.get('DB_POOL_MAX_SIZE'):
+            # Django's own pool (Django 5.1+ with psycopg 3) replaces persistent connections
+            if django.VERSION < (5, 1) or not find_spec('psycopg_pool'):
+                raise ImproperlyConfigured(
+                    'DB_POOL_MAX_SIZE needs Django 5.1+ and psycopg 3 with its pool '
+                    '(pip install "psycopg[binary,pool]"); unset it to use psycopg2 with CONN_MAX_AGE'
+                )
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS']['pool'] = {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            }
+    else:
+        config.update({
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / os.environ.get(f'{prefix}_NAME', default_name),
+        })
+    return config
+
+DATABASES = {
+    'default': _database_settings('DB', 'db.sqlite3'),
 }
+if os.environ.get('DB_REPLICA_NAME') or os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **_database_settings('DB_REPLICA', 'db_replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['products.db_routers.ReplicaRouter']
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -136,15 +188,34 @@ CORS_ALLOW_CREDENTIALS = True
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 
 # Logging
+# Handlers write from a background thread so requests never wait on disk I/O
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'products.log_handlers.JsonFormatter'},
+    },
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            'class': 'products.log_handlers.BackgroundHandler',
+            'handler_class': 'logging.FileHandler',
             'filename': BASE_DIR / 'footwear_saas.log',
         },
+        'access': {
+            'level': 'INFO',
+            'class': 'products.log_handlers.BackgroundHandler',
+            'handler_class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'footwear_access.log',
+            'formatter': 'json',
+        },
+        'requests': {
+            'level': 'INFO',
+            'class': 'products.log_handlers.BackgroundHandler',
+            'handler_class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'footwear_requests.log',
+            'formatter': 'json',
+        },
     },
     'loggers': {
         'django': {
@@ -152,6 +223,18 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # One line per request, from AccessLogMiddleware
+        'footwear.access': {
+            'handlers': ['access'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # Sampled SQL and section timings, from RequestTimingMiddleware
+        'footwear.requests': {
+            'handlers': ['requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -160,7 +243,33 @@ FOOTWEAR_SETTINGS = {
     'DEFAULT_PRODUCTION_DAYS': 14,
     'MINIMUM_ORDER_QUANTITY': 1,
     'DEFAULT_TAX_RATE': 8.25,
+    'DEFAULT_TAX_JURISDICTION': 'California',
+    'TAX_RATE_CACHE_SECONDS': 300,
+    'TAX_ROUNDING': 'line',  # line or invoice
+    'RECONCILIATION_TOLERANCE': '0.50',
     'INVOICE_DUE_DAYS': 30,
+    'LEDGER_CHECKPOINT_DAYS': 30,
+    'INVENTORY_COSTING_METHOD': 'fifo',  # fifo or average
+    'CATALOG_SYNC_SETTLE_SECONDS': 5,
+    'DESIGN_CUSTOMIZATION_FEE': '50.00',
+    'DESIGN_MATERIAL_MARKUP': '2.0',  # multiplier on the extra material cost of an upgrade
+    'DESIGN_PRICE_CACHE_SECONDS': 300,
+    'REQUEST_TIMING_SAMPLE_RATE': 0.01,  # share of requests with SQL and section timings; staff always
+    'REQUEST_TIMING_SLOW_MS': 1000,
+    'REQUEST_TIMING_DUPLICATE_THRESHOLD': 5,  # runs of one statement that count as N+1
+    'REQUEST_TIMING_SLOWEST': 5,
+    'PROFILE_SAMPLE_RATE': 0,  # share of all requests to profile; staff can ask with X-Profile or ?profile=1
+    'PROFILE_DIR': BASE_DIR / 'profiles',
+    'PROFILE_KEEP': 50,  # newest profiles kept on disk
+    'METRICS_TOKEN': os.environ.get('METRICS_TOKEN', ''),  # bearer token for /metrics/; staff only when empty
+    # GET views whose reads go to the replica, when one is configured. Keep the
+    # catalog change feed on the primary: replica lag beyond its settle window
+    # would move cursors past rows the replica has not received yet
+    'REPLICA_VIEWS': [
+        'web:home', 'web:catalog', 'web:product_detail', 'web:design_options',
+        'web:dashboard', 'web:admin_dashboard', 'web:ar_aging_report', 'web:export_data',
+    ],
+    'REPLICA_STICKY_SECONDS': 10,  # reads stay on the primary this long after a write request
     'COMPANY_NAME': 'FootwearCraft SaaS',
     'COMPANY_ADDRESS': '123 Footwear Lane, Shoe City, SC 12345',
     'COMPANY_PHONE': '(555) 123-SHOE',
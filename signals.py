@@ -1,7 +1,16 @@
 # Django signals for products app
-from django.db.models.signals import post_save
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import ProductionOrder, BillOfMaterials
+from accounting.models import Invoice, InvoiceItem, Payment, TaxRate
+from .catalog_sync import record_deletion, touch_products
+from .credit import apply_balance_changes, invoice_balances, release_order_holds
+from .design_batching import update_fingerprints
+from .design_pricing import clear_design_price_cache
+from .documents import bump_document_version, schedule_render
+from .models import ProductionOrder, BillOfMaterials, CustomDesign, DesignMaterial, FootwearProduct, Material, PriceListEntry, SizeConversion
+from .pricing import refresh_price_lists
+from .tax import clear_tax_rate_cache
 
 @receiver(post_save, sender=ProductionOrder)
 def update_production_costs(sender, instance, created, **kwargs):
@@ -18,4 +27,138 @@ def update_production_costs(sender, instance, created, **kwargs):
         # Simple overhead cost calculation (10% of material + labor)
         instance.overhead_cost = (instance.material_cost + instance.labor_cost) * 0.1
         
-        instance.save()
\ No newline at end of file
+        instance.save()
+
+@receiver(post_save, sender=FootwearProduct)
+def refresh_product_price_list(sender, instance, update_fields=None, **kwargs):
+    """Keep the precomputed tier price list in step with base_price"""
+    if update_fields is None or 'base_price' in update_fields:
+        refresh_price_lists([instance.pk])
+
+@receiver(post_save, sender=ProductionOrder)
+def release_cancelled_order_credit(sender, instance, **kwargs):
+    """Give reserved credit back when an order is cancelled"""
+    if instance.status == 'cancelled':
+        release_order_holds(instance.pk)
+
+@receiver(post_save, sender=TaxRate)
+@receiver(post_delete, sender=TaxRate)
+def invalidate_tax_rate_cache(sender, **kwargs):
+    """Reload tax rates on next use after any rate changes"""
+    clear_tax_rate_cache()
+
+@receiver(post_save, sender=Invoice)
+def refresh_invoice_document(sender, instance, **kwargs):
+    """Invalidate the stored document and pre-render invoices once finalized"""
+    bump_document_version(instance.pk)
+    if instance.status != 'draft':
+        schedule_render(instance.pk)
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_invoice_document(sender, instance, **kwargs):
+    """Items and payments are part of the rendered invoice"""
+    bump_document_version(instance.invoice_id)
+
+def _balance_invoice_ids(instance):
+    if isinstance(instance, Invoice):
+        return [] if instance._state.adding else [instance.pk]
+    return [instance.invoice_id]
+
+def _deleted_with_invoice(origin):
+    # Payments removed by an invoice's cascade are settled by the invoice's own handler
+    return isinstance(origin, Invoice) or (isinstance(origin, QuerySet) and origin.model is Invoice)
+
+@receiver(pre_save, sender=Invoice)
+@receiver(pre_delete, sender=Invoice)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_delete, sender=Payment)
+def remember_credit_balance(sender, instance, origin=None, **kwargs):
+    """What the invoice added to its customer's balance before the change"""
+    if sender is Payment and _deleted_with_invoice(origin):
+        return
+    instance._balance_before = invoice_balances(_balance_invoice_ids(instance))
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_credit_balance(sender, instance, **kwargs):
+    """Keep current_balance in step with open invoice totals less payments"""
+    before = getattr(instance, '_balance_before', None)
+    if before is None:
+        return
+    del instance._balance_before
+    invoice_id = instance.pk if sender is Invoice else instance.invoice_id
+    apply_balance_changes(before, invoice_balances([invoice_id]))
+
+CATALOG_KINDS = {
+    FootwearProduct: 'product',
+    Material: 'material',
+    SizeConversion: 'size',
+    PriceListEntry: 'price',
+}
+
+@receiver(post_delete, sender=FootwearProduct)
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=SizeConversion)
+@receiver(post_delete, sender=PriceListEntry)
+def record_catalog_deletion(sender, instance, **kwargs):
+    """Leave a tombstone so catalog sync clients learn about deletes"""
+    record_deletion(CATALOG_KINDS[sender], instance.pk)
+
+@receiver(m2m_changed, sender=FootwearProduct.available_sizes.through)
+@receiver(m2m_changed, sender=FootwearProduct.available_materials.through)
+def touch_product_options(sender, instance, action, reverse, pk_set, **kwargs):
+    """Size and material lists are part of the product's sync payload"""
+    if action == 'pre_clear' and reverse:
+        # post_clear has no pk_set; remember which products lose this size or material
+        instance._cleared_product_ids = list(instance.footwearproduct_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear' and reverse:
+        product_ids = instance.__dict__.pop('_cleared_product_ids', None)
+    else:
+        product_ids = pk_set if reverse else [instance.pk]
+    if product_ids:
+        touch_products(product_ids)
+
+@receiver(post_save, sender=BillOfMaterials)
+@receiver(post_delete, sender=BillOfMaterials)
+def invalidate_bom_design_prices(sender, instance, **kwargs):
+    """BOM components are the basis of the design option matrix"""
+    clear_design_price_cache([instance.product_id])
+
+@receiver(post_save, sender=FootwearProduct)
+@receiver(post_delete, sender=FootwearProduct)
+def invalidate_product_design_prices(sender, instance, **kwargs):
+    clear_design_price_cache([instance.pk])
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def invalidate_material_design_prices(sender, instance, **kwargs):
+    """A material cost can appear in many products' matrices"""
+    clear_design_price_cache()
+
+@receiver(m2m_changed, sender=FootwearProduct.available_materials.through)
+def invalidate_option_design_prices(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        clear_design_price_cache([instance.pk])
+    else:
+        # pk_set is None after clearing from the material side
+        clear_design_price_cache(pk_set)
+
+@receiver(post_save, sender=CustomDesign)
+def refresh_design_fingerprint(sender, instance, **kwargs):
+    """Colors and the base product are part of the fingerprint"""
+    update_fingerprints([instance.pk])
+
+@receiver(post_save, sender=DesignMaterial)
+@receiver(post_delete, sender=DesignMaterial)
+def refresh_design_material_fingerprint(sender, instance, **kwargs):
+    update_fingerprints([instance.design_id])
@@ -0,0 +1,51 @@
+# Streaming helpers for large CSV / NDJSON responses
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+STREAM_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+class Echo:
+    """File-like object that hands back whatever is written to it"""
+    def write(self, value):
+        return value
+
+def iter_csv(fieldnames, rows):
+    """Yield CSV lines for an iterable of dicts, header first; nested values become JSON"""
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames, extrasaction='ignore')
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield writer.writeheader()
+    for row in rows:
+        for name in fieldnames:
+            if isinstance(row.get(name), (dict, list)):
+                row[name] = encoder.encode(row[name])
+        yield writer.writerow(row)
+
+def iter_ndjson(rows):
+    """Yield one JSON document per line for an iterable of dicts"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+def iter_format(fmt, fieldnames, rows):
+    if fmt == 'csv':
+        return iter_csv(fieldnames, rows)
+    return iter_ndjson(rows)
+
+def streaming_response(fmt, fieldnames, rows, filename):
+    """Build a StreamingHttpResponse that never holds the full body in memory"""
+    response = StreamingHttpResponse(
+        iter_format(fmt, fieldnames, rows),
+        content_type=STREAM_FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+def write_stream(stream, fmt, fieldnames, rows):
+    """Write rows to a file-like object (used by management commands)"""
+    for chunk in iter_format(fmt, fieldnames, rows):
+        stream.write(chunk)
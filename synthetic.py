@@ -0,0 +1,406 @@
+# Deterministic synthetic data for load testing
+import itertools
+import logging
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from accounting.models import Invoice, InvoiceItem, Payment
+from .credit import check_credit_balances
+from .design_batching import design_fingerprint
+from .models import (
+    BillOfMaterials, CustomDesign, DesignMaterial, FootwearCategory, FootwearProduct,
+    Material, ProductionOrder, SizeChart, SizeConversion, WholesaleCustomer,
+)
+from .order_entry import production_costs
+from .pricing import refresh_price_lists, tier_unit_price
+from .tax import calculate_tax
+
+logger = logging.getLogger(__name__)
+
+SKU_PREFIX = 'SYN-'
+USERNAME_PREFIX = 'syn_'
+CENT = Decimal('0.01')
+
+# (region, gender, first size, step, count, first foot length in mm)
+SIZE_CHARTS = [
+    ('US', 'M', Decimal('6'), Decimal('0.5'), 15, Decimal('245')),
+    ('US', 'W', Decimal('5'), Decimal('0.5'), 15, Decimal('220')),
+    ('US', 'K', Decimal('10'), Decimal('0.5'), 12, Decimal('165')),
+    ('EU', 'U', Decimal('35'), Decimal('1'), 14, Decimal('225')),
+    ('UK', 'U', Decimal('3'), Decimal('0.5'), 18, Decimal('220')),
+    ('JP', 'U', Decimal('22'), Decimal('0.5'), 16, Decimal('220')),
+    ('CN', 'U', Decimal('35'), Decimal('1'), 14, Decimal('225')),
+]
+COMPONENTS = ['Upper', 'Lining', 'Insole', 'Midsole', 'Outsole', 'Laces', 'Heel Counter']
+COLORS = ['Black', 'White', 'Brown', 'Tan', 'Navy', 'Red', 'Grey', 'Olive']
+ORDER_STATUSES = [('completed', 60), ('in_production', 15), ('pending', 10), ('approved', 5), ('quality_check', 5), ('cancelled', 5)]
+TIERS = [('bronze', 55), ('silver', 25), ('gold', 15), ('platinum', 5)]
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT)
+
+def _zipf_weights(count, exponent=1.1):
+    """Cumulative weights where rank r is 1/r^exponent as likely as rank 1"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def already_generated():
+    return FootwearProduct.objects.filter(sku__startswith=SKU_PREFIX).exists()
+
+def _size_charts():
+    """{gender: [[(size id, label)] per region]}; charts and sizes are shared, so existing ones are reused"""
+    SizeChart.objects.bulk_create([
+        SizeChart(name=f'{region} {gender} Sizes', region=region, gender=gender)
+        for region, gender, *rest in SIZE_CHARTS
+    ], ignore_conflicts=True)
+    charts = {(chart.region, chart.gender): chart.pk for chart in SizeChart.objects.all()}
+    SizeConversion.objects.bulk_create([
+        SizeConversion(
+            size_chart_id=charts[(region, gender)],
+            size_value=f'{(first + step * position).normalize():f}',
+            length_mm=length + Decimal('5') * position,
+        )
+        for region, gender, first, step, count, length in SIZE_CHARTS
+        for position in range(count)
+    ], ignore_conflicts=True)
+    by_chart = {}
+    for pk, region, gender, value in SizeConversion.objects.order_by(
+        'size_chart__region', 'size_chart__gender', 'length_mm', 'pk'
+    ).values_list('pk', 'size_chart__region', 'size_chart__gender', 'size_value'):
+        by_chart.setdefault((region, gender), []).append((pk, f'{region}{value}'))
+    # A product is sized in one region only; unisex charts exist per region
+    sizes = {}
+    for (region, gender), chart in by_chart.items():
+        sizes.setdefault(gender, []).append(chart)
+    return sizes
+
+def _catalog(rng, product_count, material_count, batch_size, log):
+    """Categories, materials, products with sizes, materials and BOM; returns product state"""
+    FootwearCategory.objects.bulk_create([
+        FootwearCategory(name=f'Synthetic Category {number}', slug=f'syn-category-{number}')
+        for number in range(1, 21)
+    ], ignore_conflicts=True)
+    categories = list(FootwearCategory.objects.filter(slug__startswith='syn-category-').order_by('slug').values_list('pk', flat=True))
+
+    types = [value for value, label in Material.MATERIAL_TYPES]
+    materials = Material.objects.bulk_create([
+        Material(
+            name=f'Synthetic {rng.choice(types).title()} {number}',
+            material_type=rng.choice(types),
+            color=rng.choice(COLORS),
+            supplier=f'Synthetic Supplier {rng.randint(1, 40)}',
+            cost_per_unit=_money(rng.lognormvariate(2.3, 0.6)),
+        )
+        for number in range(1, material_count + 1)
+    ], batch_size=batch_size)
+    material_costs = [(material.pk, material.cost_per_unit) for material in materials]
+    log(f'{len(materials)} materials')
+
+    sizes = _size_charts()
+    genders = [value for value, label in FootwearProduct.GENDER_CHOICES]
+    products = {}
+    for numbers in _batches(range(1, product_count + 1), batch_size):
+        batch = []
+        specs = []
+        for number in numbers:
+            gender = rng.choice(genders)
+            batch.append(FootwearProduct(
+                name=f'Synthetic Shoe {number}',
+                sku=f'{SKU_PREFIX}{number:07d}',
+                category_id=rng.choice(categories),
+                gender=gender,
+                description=f'Synthetic product {number} for load testing.',
+                base_price=_money(rng.lognormvariate(4.5, 0.5)),
+                customizable=rng.random() < 0.3,
+                production_time_days=rng.randint(7, 35),
+                minimum_order_quantity=rng.choice([1, 1, 1, 6, 12, 24]),
+            ))
+            chart = rng.choice(sizes.get(gender) or sizes['U'])
+            start = rng.randint(0, max(len(chart) - 8, 0))
+            bom = {
+                component: rng.choice(material_costs)
+                for component in rng.sample(COMPONENTS, rng.randint(3, 6))
+            }
+            specs.append((
+                chart[start:start + rng.randint(6, 12)],
+                rng.sample(material_costs, min(len(material_costs), rng.randint(2, 6))),
+                {component: (material, _money(rng.uniform(0.1, 2.5))) for component, material in bom.items()},
+            ))
+        with transaction.atomic():
+            FootwearProduct.objects.bulk_create(batch, batch_size=batch_size)
+            FootwearProduct.available_sizes.through.objects.bulk_create([
+                FootwearProduct.available_sizes.through(footwearproduct_id=product.pk, sizeconversion_id=size_id)
+                for product, (size_ids, options, bom) in zip(batch, specs)
+                for size_id, label in size_ids
+            ], batch_size=batch_size)
+            FootwearProduct.available_materials.through.objects.bulk_create([
+                FootwearProduct.available_materials.through(footwearproduct_id=product.pk, material_id=material_id)
+                for product, (size_ids, options, bom) in zip(batch, specs)
+                for material_id, cost in options
+            ], batch_size=batch_size)
+            BillOfMaterials.objects.bulk_create([
+                BillOfMaterials(
+                    product_id=product.pk, material_id=material_id,
+                    component_name=component, quantity_required=quantity,
+                )
+                for product, (size_ids, options, bom) in zip(batch, specs)
+                for component, ((material_id, cost), quantity) in bom.items()
+            ], batch_size=batch_size)
+        for product, (size_ids, options, bom) in zip(batch, specs):
+            products[product.pk] = {
+                'base_price': product.base_price,
+                'gender': product.gender,
+                'production_time_days': product.production_time_days,
+                'sizes': size_ids,
+                'options': [material_id for material_id, cost in options],
+                'bom': [(quantity, cost) for (material_id, cost), quantity in bom.values()],
+                'components': [(component, material_id) for component, ((material_id, cost), quantity) in bom.items()],
+            }
+        log(f'{len(products)} products')
+    refresh_price_lists(list(products))
+    return products
+
+def _customers(rng, count, batch_size, log):
+    """Users with approved wholesale accounts; returns [(user id, customer id, tier, terms, number)] and activity weights"""
+    customers = []
+    for numbers in _batches(range(1, count + 1), batch_size):
+        users = User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}{number:06d}', email=f'buyer{number}@synthetic.test', password='!')
+            for number in numbers
+        ], batch_size=batch_size)
+        accounts = WholesaleCustomer.objects.bulk_create([
+            WholesaleCustomer(
+                user_id=user.pk,
+                business_name=f'Synthetic Retailer {number}',
+                credit_limit=_money(rng.choice([5000, 10000, 25000, 50000, 100000, 250000])),
+                discount_tier=_weighted(rng, TIERS),
+                payment_terms=rng.choice([15, 30, 30, 30, 45, 60]),
+                billing_address=f'{number} Synthetic Street',
+                shipping_address=f'{number} Synthetic Street',
+                contact_person=f'Buyer {number}',
+                phone=f'555-{number:07d}',
+                email=f'buyer{number}@synthetic.test',
+                approved=True,
+            )
+            for number, user in zip(numbers, users)
+        ], batch_size=batch_size)
+        customers.extend(
+            (account.user_id, account.pk, account.discount_tier, account.payment_terms, number)
+            for number, account in zip(numbers, accounts)
+        )
+    log(f'{len(customers)} customers')
+    # A few customers place most of the orders
+    weights = list(itertools.accumulate(rng.paretovariate(1.2) for customer in customers))
+    return customers, weights
+
+def _designs(rng, count, products, customers, product_weights, product_ids, batch_size, log):
+    """Custom designs, some exact repeats of others; returns [(design id, product id, user id)]"""
+    fee = Decimal(str(settings.FOOTWEAR_SETTINGS['DESIGN_CUSTOMIZATION_FEE']))
+    designs = []
+    recent = []
+    for numbers in _batches(range(1, count + 1), batch_size):
+        batch = []
+        choices = []
+        for number in numbers:
+            if recent and rng.random() < 0.4:
+                # Popular designs are ordered again in other sizes
+                product_id, materials, colors = rng.choice(recent)
+            else:
+                product_id = rng.choices(product_ids, cum_weights=product_weights)[0]
+                product = products[product_id]
+                materials = [
+                    (component, rng.choice(product['options']) if rng.random() < 0.5 else material_id)
+                    for component, material_id in product['components']
+                ]
+                colors = {'upper': rng.choice(COLORS).lower(), 'sole': rng.choice(COLORS).lower()}
+                recent = (recent + [(product_id, materials, colors)])[-200:]
+            user_id = rng.choice(customers)[0]
+            product = products[product_id]
+            batch.append(CustomDesign(
+                customer_id=user_id,
+                base_product_id=product_id,
+                design_name=f'Synthetic Design {number}',
+                custom_colors=colors,
+                size_id=rng.choice(product['sizes'])[0],
+                base_price=product['base_price'],
+                customization_fee=fee,
+                total_price=product['base_price'] + fee,
+                approved=rng.random() < 0.7,
+                fingerprint=design_fingerprint(product_id, materials, colors),
+            ))
+            choices.append(materials)
+        with transaction.atomic():
+            CustomDesign.objects.bulk_create(batch, batch_size=batch_size)
+            DesignMaterial.objects.bulk_create([
+                DesignMaterial(design_id=design.pk, material_id=material_id, component=component.lower())
+                for design, materials in zip(batch, choices)
+                for component, material_id in materials
+            ], batch_size=batch_size)
+        designs.extend((design.pk, design.base_product_id, design.customer_id) for design in batch)
+    log(f'{len(designs)} designs')
+    return designs
+
+def _orders(rng, count, products, customers, customer_weights, product_ids, product_weights, designs, as_of, batch_size, log):
+    created = 0
+    for numbers in _batches(range(1, count + 1), batch_size):
+        batch = []
+        for number in numbers:
+            design = rng.choice(designs) if designs and rng.random() < 0.1 else None
+            if design:
+                design_id, product_id, user_id = design
+                quantity = 1
+            else:
+                design_id = None
+                product_id = rng.choices(product_ids, cum_weights=product_weights)[0]
+                user_id = rng.choices(customers, cum_weights=customer_weights)[0][0]
+                quantity = max(1, int(rng.lognormvariate(3, 1)))
+            product = products[product_id]
+            breakdown = {}
+            for size_id, label in rng.choices(product['sizes'], k=min(quantity, 6)):
+                breakdown[label] = breakdown.get(label, 0) + 1
+            # Spread the rest of the quantity over the chosen sizes
+            for position in range(quantity - sum(breakdown.values())):
+                key = rng.choice(list(breakdown))
+                breakdown[key] += 1
+            started = as_of - timedelta(days=rng.randint(0, 365))
+            status = _weighted(rng, ORDER_STATUSES)
+            material, labor, overhead = production_costs(product['bom'], quantity)
+            batch.append(ProductionOrder(
+                order_number=f'SYN{number:08d}',
+                product_id=product_id,
+                custom_design_id=design_id,
+                quantity=quantity,
+                size_breakdown=breakdown,
+                start_date=started,
+                expected_completion=started + timedelta(days=product['production_time_days']),
+                actual_completion=started + timedelta(days=product['production_time_days'] + rng.randint(-3, 10)) if status == 'completed' else None,
+                status=status,
+                material_cost=material,
+                labor_cost=labor,
+                overhead_cost=overhead,
+                total_cost=material + labor + overhead,
+                created_by_id=user_id,
+            ))
+        ProductionOrder.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+        if created % (batch_size * 20) == 0 or created == count:
+            log(f'{created} production orders')
+
+def _invoices(rng, count, products, customers, customer_weights, product_ids, product_weights, created_by, as_of, batch_size, log):
+    rate = Decimal(str(settings.FOOTWEAR_SETTINGS['DEFAULT_TAX_RATE']))
+    discounts = WholesaleCustomer.DISCOUNT_PERCENTAGES
+    created = 0
+    for numbers in _batches(range(1, count + 1), batch_size):
+        invoices = []
+        lines = []
+        paid = []
+        for number in numbers:
+            user_id, customer_id, tier, terms, customer_number = rng.choices(customers, cum_weights=customer_weights)[0]
+            items = []
+            for product_id in rng.choices(product_ids, cum_weights=product_weights, k=rng.randint(1, 5)):
+                quantity = max(1, int(rng.lognormvariate(2.5, 1)))
+                multiplier = next(multiplier for minimum, multiplier in FootwearProduct.QUANTITY_BREAKS if quantity >= minimum)
+                unit_price = tier_unit_price(products[product_id]['base_price'], multiplier, discounts[tier])
+                items.append((product_id, quantity, unit_price))
+            subtotal, tax_amount, line_taxes = calculate_tax([quantity * price for product_id, quantity, price in items], rate)
+            total = subtotal + tax_amount
+            invoice_date = as_of - timedelta(days=rng.randint(0, 365))
+            due_date = invoice_date + timedelta(days=terms)
+            roll = rng.random()
+            if roll < 0.03:
+                status = 'draft'
+            elif due_date < as_of:
+                status = 'paid' if roll < 0.73 else 'partial' if roll < 0.83 else 'overdue'
+            else:
+                status = 'sent' if roll < 0.63 else 'paid' if roll < 0.93 else 'partial'
+            paid_amount = Decimal('0')
+            if status == 'paid':
+                paid_amount = total
+            elif status == 'partial':
+                paid_amount = _money(total * Decimal(str(rng.uniform(0.3, 0.7))))
+            payment_date = min(as_of, invoice_date + timedelta(days=rng.randint(1, terms + 15)))
+            invoices.append(Invoice(
+                invoice_number=f'SYN-INV{number:08d}',
+                customer_id=user_id,
+                wholesale_customer_id=customer_id,
+                invoice_date=invoice_date,
+                due_date=due_date,
+                paid_date=payment_date if status == 'paid' else None,
+                status=status,
+                subtotal=subtotal,
+                tax_rate=rate,
+                tax_amount=tax_amount,
+                total_amount=total,
+                billing_name=f'Synthetic Retailer {customer_number}',
+                billing_address=f'{customer_number} Synthetic Street',
+                billing_email=f'buyer{customer_number}@synthetic.test',
+                created_by=created_by,
+            ))
+            lines.append(items)
+            paid.append((paid_amount, payment_date))
+        with transaction.atomic():
+            Invoice.objects.bulk_create(invoices, batch_size=batch_size)
+            InvoiceItem.objects.bulk_create([
+                InvoiceItem(
+                    invoice_id=invoice.pk, product_id=product_id,
+                    description=f'Synthetic Shoe {product_id}',
+                    quantity=quantity, unit_price=unit_price, total_price=quantity * unit_price,
+                )
+                for invoice, items in zip(invoices, lines)
+                for product_id, quantity, unit_price in items
+            ], batch_size=batch_size)
+            Payment.objects.bulk_create([
+                Payment(
+                    invoice_id=invoice.pk, amount=amount, payment_date=payment_date,
+                    payment_method=rng.choice(['bank_transfer', 'credit_card', 'check']),
+                    reference_number=f'SYN-PAY{invoice.pk}', status='completed',
+                    processed_by=created_by,
+                )
+                for invoice, (amount, payment_date) in zip(invoices, paid)
+                if amount
+            ], batch_size=batch_size)
+        created += len(invoices)
+        if created % (batch_size * 20) == 0 or created == count:
+            log(f'{created} invoices')
+
+def generate(created_by, products=1000, materials=200, customers=100, designs=500, orders=10000,
+             invoices=2000, seed=42, as_of=None, batch_size=5000, log=logger.info):
+    """
+    Generate a referentially consistent dataset with bulk inserts.
+
+    Every value comes from one random.Random(seed), so the same arguments
+    and as_of date produce the same rows on an empty database (primary
+    keys aside). Popularity is skewed: product demand follows a Zipf
+    curve and a small share of customers place most orders and invoices.
+    Customer balances are reconciled at the end.
+    """
+    as_of = as_of or timezone.now().date()
+    rng = random.Random(seed)
+    catalog = _catalog(rng, products, materials, batch_size, log)
+    product_ids = sorted(catalog)
+    # Shuffle which products are popular, deterministically
+    rng.shuffle(product_ids)
+    product_weights = _zipf_weights(len(product_ids))
+
+    accounts, customer_weights = _customers(rng, customers, batch_size, log)
+    design_rows = _designs(rng, designs, catalog, accounts, product_weights, product_ids, batch_size, log)
+    _orders(rng, orders, catalog, accounts, customer_weights, product_ids, product_weights, design_rows, as_of, batch_size, log)
+    _invoices(rng, invoices, catalog, accounts, customer_weights, product_ids, product_weights, created_by, as_of, batch_size, log)
+    check_credit_balances(fix=True)
@@ -0,0 +1,129 @@
+# Batch invoice tax computation with cached tax rate resolution
+import bisect
+import time
+from collections import defaultdict, namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounting.models import Invoice, InvoiceItem, TaxRate
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+
+InvoiceTax = namedtuple('InvoiceTax', ['rate', 'subtotal', 'tax_amount', 'total_amount', 'line_taxes'])
+
+_rate_cache = {'loaded_at': None, 'rates': {}}
+
+def clear_tax_rate_cache():
+    """Drop the cached rates; connected to TaxRate save/delete signals"""
+    _rate_cache['loaded_at'] = None
+    _rate_cache['rates'] = {}
+
+def _cached_rates():
+    """
+    {jurisdiction: ([effective dates], [rates])} loaded with one query.
+
+    Signals clear the cache in the process that changed a rate; other
+    worker processes pick the change up after TAX_RATE_CACHE_SECONDS.
+    """
+    ttl = settings.FOOTWEAR_SETTINGS.get('TAX_RATE_CACHE_SECONDS', 300)
+    loaded_at = _rate_cache['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at > ttl:
+        rates = defaultdict(lambda: ([], []))
+        rows = TaxRate.objects.order_by('jurisdiction', 'effective_date').values_list(
+            'jurisdiction', 'effective_date', 'rate_percentage'
+        )
+        for jurisdiction, effective_date, rate in rows:
+            dates, values = rates[jurisdiction]
+            dates.append(effective_date)
+            values.append(rate)
+        _rate_cache['rates'] = dict(rates)
+        _rate_cache['loaded_at'] = time.monotonic()
+    return _rate_cache['rates']
+
+def default_jurisdiction():
+    return settings.FOOTWEAR_SETTINGS.get('DEFAULT_TAX_JURISDICTION')
+
+def rate_for(jurisdiction=None, on_date=None):
+    """Tax percentage in force for a jurisdiction on a date, from memory"""
+    jurisdiction = jurisdiction or default_jurisdiction()
+    on_date = on_date or timezone.now().date()
+    dates, values = _cached_rates().get(jurisdiction, ([], []))
+    index = bisect.bisect_right(dates, on_date)
+    if index:
+        return values[index - 1]
+    return Decimal(str(settings.FOOTWEAR_SETTINGS['DEFAULT_TAX_RATE']))
+
+def _round(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def calculate_tax(amounts, rate, rounding=None):
+    """
+    (subtotal, tax_amount, line_taxes) for a list of line amounts.
+
+    With 'line' rounding each line's tax is rounded half-up to the cent and
+    the invoice tax is their sum; with 'invoice' rounding the exact line
+    taxes are summed and rounded once.
+    """
+    rounding = rounding or settings.FOOTWEAR_SETTINGS.get('TAX_ROUNDING', 'line')
+    subtotal = Decimal('0')
+    exact_tax = Decimal('0')
+    line_taxes = []
+    for amount in amounts:
+        tax = amount * rate / HUNDRED
+        line_taxes.append(_round(tax))
+        subtotal += amount
+        exact_tax += tax
+    if rounding == 'invoice':
+        tax_amount = _round(exact_tax)
+    else:
+        tax_amount = sum(line_taxes, Decimal('0.00'))
+    return _round(subtotal), tax_amount, line_taxes
+
+def compute_invoice_taxes(invoices, jurisdictions=None, rounding=None):
+    """
+    Compute line and invoice taxes for a batch of invoices in one pass.
+
+    All items are read with a single query and rates come from the in-memory
+    cache. jurisdictions optionally maps invoice pk to a jurisdiction,
+    otherwise DEFAULT_TAX_JURISDICTION is used.
+    Returns {invoice_pk: InvoiceTax}.
+    """
+    jurisdictions = jurisdictions or {}
+    invoices = list(invoices)
+
+    lines = defaultdict(list)
+    items = InvoiceItem.objects.filter(invoice__in=invoices).order_by('pk').values_list(
+        'invoice_id', 'pk', 'quantity', 'unit_price'
+    )
+    for invoice_id, item_id, quantity, unit_price in items:
+        lines[invoice_id].append((item_id, Decimal(quantity) * unit_price))
+
+    results = {}
+    for invoice in invoices:
+        rate = rate_for(jurisdictions.get(invoice.pk), invoice.invoice_date)
+        item_ids = [item_id for item_id, amount in lines[invoice.pk]]
+        subtotal, tax_amount, line_taxes = calculate_tax(
+            [amount for item_id, amount in lines[invoice.pk]], rate, rounding
+        )
+        results[invoice.pk] = InvoiceTax(
+            rate, subtotal, tax_amount, subtotal + tax_amount, dict(zip(item_ids, line_taxes))
+        )
+    return results
+
+def apply_invoice_taxes(invoices, jurisdictions=None, rounding=None, batch_size=500):
+    """Compute taxes for a batch and write the invoice totals with bulk_update"""
+    invoices = list(invoices)
+    taxes = compute_invoice_taxes(invoices, jurisdictions, rounding)
+    for invoice in invoices:
+        result = taxes[invoice.pk]
+        invoice.subtotal = result.subtotal
+        invoice.tax_rate = result.rate
+        invoice.tax_amount = result.tax_amount
+        invoice.total_amount = result.total_amount
+    Invoice.objects.bulk_update(
+        invoices, ['subtotal', 'tax_rate', 'tax_amount', 'total_amount'], batch_size=batch_size
+    )
+    return taxes
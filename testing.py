@@ -0,0 +1,35 @@
+# Test helpers for API query budgets
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .prefetch import optimize_queryset
+
+def count_queries(func, *args, **kwargs):
+    """Number of SQL queries func runs"""
+    with CaptureQueriesContext(connection) as captured:
+        func(*args, **kwargs)
+    return len(captured.captured_queries)
+
+def assert_constant_queries(serializer_class, queryset, page_sizes=(1, 10, 50), context=None, **serializer_kwargs):
+    """
+    Fail unless serializing a page costs the same number of queries at every page size.
+
+    Each page is a slice of queryset with the serializer's prefetch plan
+    applied; serializer_kwargs (e.g. expand=['product.category']) are
+    passed to the serializer. queryset must hold at least max(page_sizes)
+    rows, otherwise the comparison proves nothing. Returns the count.
+    """
+    available = queryset.count()
+    if available < max(page_sizes):
+        raise AssertionError(f'Need {max(page_sizes)} rows to compare page sizes, found {available}')
+
+    counts = {}
+    for size in page_sizes:
+        serializer = serializer_class(many=True, context=context or {}, **serializer_kwargs)
+        page = optimize_queryset(queryset, serializer)[:size]
+        counts[size] = count_queries(
+            lambda: serializer_class(page, many=True, context=context or {}, **serializer_kwargs).data
+        )
+    if len(set(counts.values())) > 1:
+        raise AssertionError(f'Query count depends on page size: {counts}')
+    return counts[page_sizes[0]]
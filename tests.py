@@ -0,0 +1,177 @@
+# Query budget and fast-path tests for the API list endpoints, and bank statement reconciliation
+import io
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import mixins
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounting.models import Invoice, Payment
+from api.endpoints import CatalogMaterialViewSet, CatalogProductViewSet, CatalogSizeChartViewSet
+from api.fast_lists import FastJSONRenderer
+from api.serializers import FootwearProductSerializer
+from api.testing import assert_constant_queries, count_queries
+from products.models import (
+    BillOfMaterials, FootwearCategory, FootwearProduct, Material, SizeChart, SizeConversion,
+    WholesaleCustomer,
+)
+from products.reconciliation import reconcile_statement
+
+EXPAND = 'category,available_sizes.size_chart,available_materials,bom_items.material'
+
+class CatalogProductQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('partner', password='test')
+        category = FootwearCategory.objects.create(name='Sneakers', slug='sneakers')
+        chart = SizeChart.objects.create(name='EU Men', region='EU', gender='M')
+        sizes = [
+            SizeConversion.objects.create(size_chart=chart, size_value=str(value), length_mm=Decimal(value * 6))
+            for value in range(40, 44)
+        ]
+        materials = [
+            Material.objects.create(
+                name=f'Leather {number}', material_type='leather', color='black',
+                supplier='Tannery', cost_per_unit=Decimal('4.50'),
+            )
+            for number in range(3)
+        ]
+        for number in range(50):
+            product = FootwearProduct.objects.create(
+                name=f'Runner {number}', sku=f'TEST-{number:03d}', category=category,
+                gender='M', description='', base_price=Decimal('80.00'),
+            )
+            product.available_sizes.set(sizes)
+            product.available_materials.set(materials)
+            for material in materials[:2]:
+                BillOfMaterials.objects.create(
+                    product=product, material=material, quantity_required=Decimal('1.5'),
+                    component_name=f'Upper {material.pk}',
+                )
+
+    def test_expanded_products_serialize_in_constant_queries(self):
+        assert_constant_queries(
+            FootwearProductSerializer, FootwearProduct.objects.order_by('pk'), expand=EXPAND.split(',')
+        )
+
+    def test_product_list_is_planned(self):
+        view = CatalogProductViewSet.as_view({'get': 'list'})
+
+        def list_products():
+            request = APIRequestFactory().get('/catalog/products/', {'expand': EXPAND})
+            force_authenticate(request, user=self.user)
+            response = view(request)
+            self.assertEqual(response.status_code, 200)
+            response.render()
+
+        full_page = count_queries(list_products)
+        FootwearProduct.objects.exclude(sku='TEST-000').update(active=False)
+        self.assertEqual(count_queries(list_products), full_page)
+
+class FastListTests(TestCase):
+    """FastListMixin and FastJSONRenderer must produce the bytes the regular list would"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('partner', password='test')
+        category = FootwearCategory.objects.create(name='Boots', slug='boots')
+        chart = SizeChart.objects.create(name='UK Women', region='UK', gender='W', description='Größen \u2028 “UK”')
+        sizes = [
+            SizeConversion.objects.create(size_chart=chart, size_value=value, length_mm=Decimal(length))
+            for value, length in (('4', '230.50'), ('4.5', '235.00'))
+        ]
+        materials = [
+            Material.objects.create(
+                name=name, material_type='leather', color='tan', supplier='Curtidos Ñandú',
+                cost_per_unit=Decimal(cost),
+            )
+            for name, cost in (('Nubuck', '12.10'), ('Suede', '9.00'))
+        ]
+        for number, heel in enumerate((Decimal('25.50'), None)):
+            product = FootwearProduct.objects.create(
+                name=f'Chelsea {number}', sku=f'FAST-{number}', category=category, gender='W',
+                description='Waxed <leather> & “café” finish', base_price=Decimal('129.90'),
+                heel_height=heel,
+            )
+            product.available_sizes.set(reversed(sizes))
+            product.available_materials.set(materials)
+
+    def assert_same_list(self, viewset, path):
+        plain = type('Plain', (viewset,), {'list': mixins.ListModelMixin.list, 'renderer_classes': [JSONRenderer]})
+        responses = []
+        for view in (viewset, plain):
+            request = APIRequestFactory().get(path)
+            force_authenticate(request, user=self.user)
+            response = view.as_view({'get': 'list'})(request)
+            self.assertEqual(response.status_code, 200)
+            responses.append(response.render().content)
+        self.assertEqual(responses[0], responses[1])
+
+    def test_product_list(self):
+        self.assert_same_list(CatalogProductViewSet, '/catalog/products/')
+
+    def test_material_list(self):
+        self.assert_same_list(CatalogMaterialViewSet, '/catalog/materials/')
+
+    def test_size_chart_list(self):
+        self.assert_same_list(CatalogSizeChartViewSet, '/catalog/size-charts/')
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'price': Decimal('129.90'),
+            'created_at': datetime(2025, 6, 1, 12, 30, 5, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2025, 6, 1),
+            'text': 'Größe \u2028 \u2029 <b>',
+            'missing': None,
+            'nested': {'z': [3, 1, 2], 'a': {'y': 1.5, 'b': 1e20, 'c': 1e-7}},
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('accounts', password='test', is_staff=True)
+        cls.user = User.objects.create_user('acme', password='test')
+        cls.customer = WholesaleCustomer.objects.create(
+            user=cls.user, business_name='Acme Shoes', tax_id='ACME-123', approved=True,
+            billing_address='1 Main St', shipping_address='1 Main St', contact_person='Ann',
+            phone='555-0100', email='ap@acme.test',
+        )
+        cls.invoices = [cls.invoice(number, amount) for number, amount in ((1, '100.00'), (2, '250.00'))]
+
+    @classmethod
+    def invoice(cls, number, amount):
+        today = date(2025, 6, 1)
+        return Invoice.objects.create(
+            invoice_number=f'INV-TEST-{number}', customer=cls.user, wholesale_customer=cls.customer,
+            invoice_date=today, due_date=today + timedelta(days=30), status='sent',
+            subtotal=Decimal(amount), tax_amount=Decimal('0'), total_amount=Decimal(amount),
+            created_by=cls.staff,
+        )
+
+    def reconcile(self, rows):
+        statement = 'date,amount,reference,description\n' + ''.join(f'{row}\n' for row in rows)
+        return reconcile_statement(io.StringIO(statement), processed_by=self.staff)
+
+    def test_repeated_customer_reference_posts_every_payment(self):
+        rows = ['2025-06-10,100.00,ACME-123,', '2025-06-12,250.00,ACME-123,']
+        summary = self.reconcile(rows)
+        self.assertEqual(summary['matched'], 2)
+        self.assertEqual(summary['duplicates'], 0)
+        self.assertEqual(Payment.objects.filter(invoice__in=self.invoices).count(), 2)
+
+        summary = self.reconcile(rows)
+        self.assertEqual(summary['duplicates'], 2)
+        self.assertEqual(Payment.objects.filter(invoice__in=self.invoices).count(), 2)
+
+    def test_reimported_blank_references_are_skipped(self):
+        rows = ['2025-06-10,100.00,,Transfer', '2025-06-11,250.00,,Transfer']
+        self.assertEqual(self.reconcile(rows)['matched'], 2)
+
+        summary = self.reconcile(rows)
+        self.assertEqual(summary['matched'], 0)
+        self.assertEqual(summary['duplicates'], 2)
+        self.assertEqual(Payment.objects.filter(invoice__in=self.invoices).count(), 2)
@@ -8,10 +8,20 @@ urlpatterns = [
     path('catalog/', views.product_catalog, name='catalog'),
     path('product/<int:product_id>/', views.product_detail, name='product_detail'),
     path('custom-design/<int:product_id>/', views.custom_design, name='custom_design'),
+    path('custom-design/<int:product_id>/options/', views.design_options, name='design_options'),
     path('design/<int:design_id>/', views.design_detail, name='design_detail'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('invoice/<int:invoice_id>/', views.invoice_detail, name='invoice_detail'),
+    path('invoice/<int:invoice_id>/print/', views.invoice_print, name='invoice_print'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('reports/ar-aging/', views.ar_aging_report, name='ar_aging_report'),
+    path('reports/reconcile/', views.reconcile_bank_statement, name='reconcile_bank_statement'),
+    path('quote/', views.price_quote, name='price_quote'),
+    path('orders/bulk/', views.bulk_order_entry, name='bulk_order_entry'),
+    path('exports/<str:name>/', views.export_data, name='export_data'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>/', views.profile_detail, name='profile_detail'),
+    path('metrics/', views.metrics, name='metrics'),
     path('size-converter/', views.size_converter, name='size_converter'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
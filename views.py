@@ -2,18 +2,35 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.dateparse import parse_date
+from django.db import transaction
 from django.db.models import Sum, Count, Q
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.conf import settings
 from datetime import timedelta
 from django.core.paginator import Paginator
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+import hmac
+import io
+import json
 
 from products.models import (
     FootwearProduct, FootwearCategory, Material, SizeConversion,
     WholesaleCustomer, CustomDesign, ProductionOrder
 )
 from accounting.models import Invoice, Payment, InventoryValuation
+from products.aging import AGING_FIELDS, iter_aging_rows
+from products.design_pricing import option_matrix, price_design, save_design_materials
+from products.documents import get_invoice_document
+from products.exports import EXPORTS, export_rows
+from products.order_entry import import_order_lines, read_order_csv
+from products.metrics import METRICS_CONTENT_TYPE, render_metrics
+from products.pricing import MAX_QUOTE_LINES, quote_cart
+from products.profiling import SORT_KEYS, collapsed_stacks, profile_path, recent_profiles, stats_text
+from products.reconciliation import reconcile_statement
+from products.streaming import STREAM_FORMATS, streaming_response
 
 def home(request):
     """Homepage with product showcase"""
@@ -85,31 +102,68 @@ def custom_design(request, product_id):
         size_id = request.POST.get('size')
         special_instructions = request.POST.get('special_instructions', '')
         
+        # Component choices are posted as material_<component>=<material id>
+        selections = {
+            key[len('material_'):]: value
+            for key, value in request.POST.items()
+            if key.startswith('material_') and value
+        }
+        
         if design_name and size_id:
             try:
-                size = SizeConversion.objects.get(id=size_id)
-                design = CustomDesign.objects.create(
-                    customer=request.user,
-                    base_product=product,
-                    design_name=design_name,
-                    size=size,
-                    special_instructions=special_instructions,
-                    base_price=product.base_price,
-                    customization_fee=Decimal('50.00'),  # Base customization fee
-                )
+                size = product.available_sizes.get(id=size_id)
+                price = price_design(product.id, {
+                    component: int(material_id) for component, material_id in selections.items()
+                })
+                with transaction.atomic():
+                    design = CustomDesign.objects.create(
+                        customer=request.user,
+                        base_product=product,
+                        design_name=design_name,
+                        size=size,
+                        special_instructions=special_instructions,
+                        base_price=price['base_price'],
+                        customization_fee=price['customization_fee'],
+                        total_price=price['total_price'],
+                    )
+                    save_design_materials(design, price['components'])
                 
                 messages.success(request, 'Custom design created successfully!')
                 return redirect('web:design_detail', design_id=design.id)
-            except SizeConversion.DoesNotExist:
-                messages.error(request, 'Invalid size selected.')
+            except (SizeConversion.DoesNotExist, ValueError):
+                messages.error(request, 'Invalid size or material selected.')
+            except ValidationError as e:
+                for component, errors in e.message_dict.items():
+                    messages.error(request, f"{component}: {' '.join(errors)}")
     
     context = {
         'product': product,
         'available_sizes': product.available_sizes.all(),
         'available_materials': product.available_materials.all(),
+        'option_matrix': option_matrix(product.id),
     }
     return render(request, 'web/custom_design.html', context)
 
+@login_required
+def design_options(request, product_id):
+    """Option price matrix for the design configurator; POST selections to price them"""
+    if not FootwearProduct.objects.filter(id=product_id, customizable=True, active=True).exists():
+        raise Http404
+    
+    if request.method != 'POST':
+        return JsonResponse({'success': True, **option_matrix(product_id)})
+    
+    try:
+        payload = json.loads(request.body)
+        selections = {str(component): int(material_id) for component, material_id in payload['selections'].items()}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Expected {"selections": {"<component>": <material id>}}'}, status=400)
+    try:
+        price = price_design(product_id, selections)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'errors': e.message_dict}, status=400)
+    return JsonResponse({'success': True, **price})
+
 @login_required
 def design_detail(request, design_id):
     """View custom design details"""
@@ -151,6 +205,14 @@ def invoice_detail(request, invoice_id):
     }
     return render(request, 'web/invoice_detail.html', context)
 
+@login_required
+def invoice_print(request, invoice_id):
+    """Printable invoice served straight from the rendered document store"""
+    html = get_invoice_document(invoice_id, customer=request.user)
+    if html is None:
+        raise Http404('Invoice not found')
+    return HttpResponse(html)
+
 @login_required
 def admin_dashboard(request):
     """Admin dashboard with business analytics"""
@@ -207,6 +269,178 @@ def admin_dashboard(request):
     }
     return render(request, 'web/admin_dashboard.html', context)
 
+@login_required
+def ar_aging_report(request):
+    """Accounts-receivable aging per wholesale customer, streamed as CSV or NDJSON"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in STREAM_FORMATS:
+        return JsonResponse({'success': False, 'error': 'Unsupported format'}, status=400)
+    
+    as_of = timezone.now().date()
+    if request.GET.get('as_of'):
+        try:
+            as_of = parse_date(request.GET['as_of'])
+        except ValueError:
+            as_of = None
+        if as_of is None:
+            return JsonResponse({'success': False, 'error': 'Invalid as_of date'}, status=400)
+    
+    return streaming_response(
+        fmt, AGING_FIELDS, iter_aging_rows(as_of), f'ar-aging-{as_of.isoformat()}'
+    )
+
+@login_required
+def reconcile_bank_statement(request):
+    """Match an uploaded bank statement CSV to open invoices and record payments"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    if request.method != 'POST' or 'statement' not in request.FILES:
+        return JsonResponse({'success': False, 'error': 'POST a CSV file as "statement"'}, status=400)
+    
+    tolerance = None
+    if request.POST.get('tolerance'):
+        try:
+            tolerance = Decimal(request.POST['tolerance'])
+        except InvalidOperation:
+            return JsonResponse({'success': False, 'error': 'Invalid tolerance'}, status=400)
+    
+    stream = io.TextIOWrapper(request.FILES['statement'].file, encoding='utf-8-sig')
+    summary = reconcile_statement(
+        stream,
+        processed_by=request.user,
+        tolerance=tolerance,
+        dry_run=request.POST.get('dry_run') == 'true',
+    )
+    return JsonResponse({'success': True, **summary})
+
+@login_required
+def price_quote(request):
+    """Price a cart of SKU and quantity lines against the customer's tier price list"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    
+    try:
+        payload = json.loads(request.body)
+        lines = [(str(line['sku']), int(line['quantity'])) for line in payload['lines']]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Expected {"lines": [{"sku": ..., "quantity": ...}]}'}, status=400)
+    if len(lines) > MAX_QUOTE_LINES:
+        return JsonResponse({'success': False, 'error': f'At most {MAX_QUOTE_LINES} lines per quote'}, status=400)
+    
+    customer = WholesaleCustomer.objects.filter(user=request.user, approved=True).first()
+    if request.user.is_staff and payload.get('customer'):
+        try:
+            customer_id = int(payload['customer'])
+        except (ValueError, TypeError):
+            return JsonResponse({'success': False, 'error': 'customer must be a wholesale customer id'}, status=400)
+        customer = WholesaleCustomer.objects.filter(pk=customer_id).first()
+    
+    return JsonResponse({'success': True, **quote_cart(lines, customer)})
+
+@login_required
+def bulk_order_entry(request):
+    """Create wholesale production orders from an uploaded CSV or a JSON list of lines"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+    
+    if 'orders' in request.FILES:
+        lines = read_order_csv(io.TextIOWrapper(request.FILES['orders'].file, encoding='utf-8-sig'))
+        customer_id = request.POST.get('customer')
+    else:
+        try:
+            payload = json.loads(request.body)
+            lines = [
+                (position, str(line['sku']), str(line['size']), line['quantity'])
+                for position, line in enumerate(payload['lines'], start=1)
+            ]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Expected a CSV file as "orders" or {"lines": [{"sku": ..., "size": ..., "quantity": ...}]}'}, status=400)
+        customer_id = payload.get('customer')
+    
+    customer = WholesaleCustomer.objects.filter(user=request.user, approved=True).first()
+    if request.user.is_staff and customer_id:
+        try:
+            customer_id = int(customer_id)
+        except (ValueError, TypeError):
+            return JsonResponse({'success': False, 'error': 'customer must be a wholesale customer id'}, status=400)
+        customer = WholesaleCustomer.objects.filter(pk=customer_id, approved=True).select_related('user').first()
+    if customer is None:
+        return JsonResponse({'success': False, 'error': 'No approved wholesale account'}, status=403)
+    
+    orders, errors = import_order_lines(lines, customer, created_by=customer.user)
+    if errors:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+    return JsonResponse({
+        'success': True,
+        'orders': [
+            {'id': order.pk, 'order_number': order.order_number, 'quantity': order.quantity, 'size_breakdown': order.size_breakdown}
+            for order in orders
+        ],
+    })
+
+@login_required
+def export_data(request, name):
+    """Stream a full export of products, production orders or invoices as CSV or NDJSON"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    if name not in EXPORTS:
+        raise Http404
+    
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in STREAM_FORMATS:
+        return JsonResponse({'success': False, 'error': 'Unsupported format'}, status=400)
+    
+    fieldnames, rows = export_rows(name, status=request.GET.get('status'))
+    return streaming_response(fmt, fieldnames, rows, f"{name}-{timezone.now().strftime('%Y%m%d')}")
+
+@login_required
+def profile_list(request):
+    """Recently stored request profiles"""
+    if not request.user.is_staff:
+        messages.error(request, 'Access denied.')
+        return redirect('web:home')
+    
+    context = {'profiles': recent_profiles()}
+    return render(request, 'web/profiles.html', context)
+
+@login_required
+def profile_detail(request, name):
+    """One profile as a pstats report, or downloaded as pstats or collapsed stacks"""
+    if not request.user.is_staff:
+        messages.error(request, 'Access denied.')
+        return redirect('web:home')
+    path = profile_path(name)
+    if path is None:
+        raise Http404('Profile not found')
+    
+    fmt = request.GET.get('format')
+    if fmt == 'pstats':
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{name}.prof')
+    if fmt == 'collapsed':
+        response = HttpResponse(collapsed_stacks(path), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{name}.collapsed"'
+        return response
+    
+    sort = request.GET.get('sort', 'cumulative')
+    context = {
+        'name': name,
+        'report': stats_text(path, sort=sort),
+        'sort': sort,
+        'sort_keys': SORT_KEYS,
+    }
+    return render(request, 'web/profile_detail.html', context)
+
+def metrics(request):
+    """Prometheus metrics of all workers, for a scraper with the bearer token or for staff"""
+    token = settings.FOOTWEAR_SETTINGS.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (token and hmac.compare_digest(supplied.encode(), token.encode())) and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 @login_required
 def size_converter(request):
     """Size conversion tool"""